@@ -0,0 +1,42 @@
+# Compares the toornament API requests of an updateall over a stage with many groups
+# when every group is fetched on its own and when all groups are fetched in one batch
+#
+# Usage: python benchmarks/batched_groups.py [groupsPerStage] [teamsPerGroup]
+
+import sys
+import datetime
+from fakeapi import FakeSeason, createToornament
+
+
+def main():
+    groupsPerStage = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    teamsPerGroup = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    season = FakeSeason(groupsPerStage = groupsPerStage, teamsPerGroup = teamsPerGroup, playedRounds = 3)
+
+    singleClient = createToornament(season)
+    batchClient = createToornament(season)
+    stages = batchClient.stages
+
+    # Cold cache: first updateall of the season
+    for stage in stages:
+        singleClient.getWeekInfo(stage, 4)
+    batchClient.getWeekInfos(stages, 4)
+
+    coldSingle = singleClient.session.requestCount
+    coldBatch = batchClient.session.requestCount
+
+    # Warm cache: updateall after the refresh interval has passed
+    season.completeRound(4)
+    singleClient.fixtureRefreshTime = datetime.timedelta(0)
+    batchClient.fixtureRefreshTime = datetime.timedelta(0)
+
+    for stage in stages:
+        singleClient.getWeekInfo(stage, 4)
+    batchClient.getWeekInfos(stages, 4)
+
+    print(f'Stage with {groupsPerStage} groups of {teamsPerGroup} teams')
+    print(f'Cold updateall: {coldSingle} requests per group, {coldBatch} requests batched')
+    print(f'Warm updateall: {singleClient.session.requestCount - coldSingle} requests per group, {batchClient.session.requestCount - coldBatch} requests batched')
+
+main()
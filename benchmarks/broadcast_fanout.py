@@ -0,0 +1,94 @@
+# Compares posting the same embeds to many channels one by one and through the concurrent Broadcaster
+# Uses mock Discord channels with a fixed send latency, some of which fail or hang
+#
+# Usage: python benchmarks/broadcast_fanout.py [targetCount] [latencyMs]
+
+import os
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'source'))
+
+from broadcast import Broadcaster
+
+
+# Mock of a Discord text channel, mimics the send coroutine of discord.py
+class MockChannel:
+
+    def __init__(self, channelID, latency, failure = None):
+        self.id = channelID
+        self.latency = latency
+        self.failure = failure
+        self.received = []
+
+    async def send(self, **message):
+        if self.failure == 'hang':
+            await asyncio.sleep(3600)
+        await asyncio.sleep(self.latency)
+        if self.failure == 'error':
+            raise PermissionError('Missing Permissions')
+        self.received += [message]
+
+
+# Mock of the Discord client, only knows the channels it was given
+class MockClient:
+
+    def __init__(self, channels):
+        self.channels = {channel.id: channel for channel in channels}
+
+    def get_channel(self, channelID):
+        return self.channels.get(channelID)
+
+
+def createClient(targetCount, latency):
+    channels = []
+    for channelID in range(1, targetCount + 1):
+        failure = None
+        if channelID == 7:
+            failure = 'error'
+        elif channelID == 13:
+            failure = 'hang'
+        channels += [MockChannel(channelID, latency, failure)]
+
+    # One target points to a channel the bot can't see anymore
+    return MockClient(channels[:-1])
+
+
+# Old behaviour: one await per message and channel, a failing channel stops the remaining posts
+async def sendSequentially(client, channelIDs, messages, timeout):
+    delivered = 0
+    for channelID in channelIDs:
+        channel = client.get_channel(channelID)
+        try:
+            for message in messages:
+                await asyncio.wait_for(channel.send(**message), timeout)
+            delivered += 1
+        except Exception:
+            pass
+    return delivered
+
+async def run(targetCount, latency):
+    messages = [{'embed': 'standings'}, {'embed': 'toornament'}]
+    channelIDs = list(range(1, targetCount + 1))
+    timeout = 2.0
+
+    client = createClient(targetCount, latency)
+    startTime = time.monotonic()
+    delivered = await sendSequentially(client, channelIDs, messages, timeout)
+    sequentialTime = time.monotonic() - startTime
+
+    client = createClient(targetCount, latency)
+    broadcaster = Broadcaster(client.get_channel, timeout = timeout)
+    report = await broadcaster.broadcast(channelIDs, messages)
+
+    print(f'{targetCount} targets, {len(messages)} messages each, {latency * 1000:.0f}ms send latency')
+    print(f'Sequential:  delivered to {delivered}/{targetCount} channels in {sequentialTime:.2f}s')
+    print(f'Broadcaster: {report.toString()}')
+
+def main():
+    targetCount = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = (int(sys.argv[2]) if len(sys.argv) > 2 else 80) / 1000
+    asyncio.run(run(targetCount, latency))
+
+main()
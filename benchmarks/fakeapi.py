@@ -0,0 +1,190 @@
+import os
+import sys
+import io
+import time
+import atexit
+import shutil
+import tempfile
+import requests
+from urllib.parse import urlparse, parse_qs
+
+# Makes the bot sources importable from the benchmark scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'source'))
+
+from toornament import Toornament
+
+
+# Response of the fake toornament API, mimics the parts of requests.Response used by the bot
+class FakeResponse:
+
+    def __init__(self, statusCode, items = None, headers = None):
+        self.status_code = statusCode
+        self.items = items
+        self.headers = headers or {}
+
+    def json(self):
+        return self.items
+
+
+# Generated season of one tournament with double round robin groups
+class FakeSeason:
+
+    def __init__(self, stageCount = 1, groupsPerStage = 1, teamsPerGroup = 8, playedRounds = 0):
+        self.stages = []
+        self.teamNames = []
+        self.rounds = []
+        self.matches = []
+        self.rankingItems = []
+
+        for stageIndex in range(stageCount):
+            stageID = f'{1000 + stageIndex}'
+            groupIDs = []
+
+            for groupIndex in range(groupsPerStage):
+                groupID = f'{stageID}{groupIndex:02d}'
+                groupIDs += [groupID]
+                teams = [f'Team {stageIndex}-{groupIndex}-{teamIndex}' for teamIndex in range(teamsPerGroup)]
+                self.teamNames += teams
+                self.addGroup(stageID, groupID, teams, playedRounds)
+
+            self.stages += [(stageID, groupIDs)]
+
+    # Adds rounds, matches and ranking items of a double round robin group
+    def addGroup(self, stageID, groupID, teams, playedRounds):
+        # Circle method to pair every team with every other team once per half season
+        rotation = list(teams)
+        if len(rotation) % 2 == 1:
+            rotation += [None]
+
+        pairings = []
+        for _ in range(len(rotation) - 1):
+            half = len(rotation) // 2
+            pairings += [[(rotation[i], rotation[-1 - i]) for i in range(half) if rotation[i] is not None and rotation[-1 - i] is not None]]
+            rotation = [rotation[0]] + [rotation[-1]] + rotation[1:-1]
+        pairings += [[(away, home) for home, away in roundPairs] for roundPairs in pairings]
+
+        matchNumber = 1
+        for roundIndex, roundPairs in enumerate(pairings):
+            roundID = f'{groupID}{roundIndex + 1:03d}'
+            self.rounds += [{'id': roundID, 'stage_id': stageID, 'group_id': groupID, 'number': roundIndex + 1}]
+
+            for home, away in roundPairs:
+                completed = roundIndex < playedRounds
+                self.matches += [{
+                    'id': f'{roundID}{matchNumber:03d}',
+                    'number': matchNumber,
+                    'stage_id': stageID,
+                    'group_id': groupID,
+                    'round_id': roundID,
+                    'round_number': roundIndex + 1,
+                    'status': 'completed' if completed else 'pending',
+                    'opponents': [
+                        {'participant': {'name': home}, 'score': 3 if completed else None, 'forfeit': False},
+                        {'participant': {'name': away}, 'score': 1 if completed else None, 'forfeit': False}
+                    ]
+                }]
+                matchNumber += 1
+
+        for position, team in enumerate(teams):
+            self.rankingItems += [{
+                'stage_id': stageID,
+                'group_id': groupID,
+                'position': position + 1,
+                'rank': position + 1,
+                'points': 3 * (len(teams) - position),
+                'participant': {'name': team},
+                'properties': {
+                    'wins': len(teams) - position, 'losses': position, 'played': len(teams), 'forfeits': 0,
+                    'score_for': 3 * (len(teams) - position), 'score_against': position, 'score_difference': 3 * (len(teams) - position) - position
+                }
+            }]
+
+    # Marks all matches of the given round number as completed
+    def completeRound(self, roundNumber):
+        for match in self.matches:
+            if match['round_number'] == roundNumber:
+                match['status'] = 'completed'
+                match['opponents'][0]['score'] = 3
+                match['opponents'][1]['score'] = 1
+
+
+# Replaces requests.Session of the Toornament client and answers from a generated season
+# Counts every request so the number of API calls of different code paths can be compared
+# Outages can be injected by setting failure to 'error' (HTTP 503) or 'timeout' (waits latency seconds, then times out)
+class FakeSession:
+
+    def __init__(self, season):
+        self.season = season
+        self.requestCount = 0
+        self.requestedURLs = []
+        self.failure = None
+        self.latency = 0.0
+
+    def get(self, url, headers = None, timeout = None):
+        self.requestCount += 1
+        self.requestedURLs += [url]
+
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if self.failure == 'timeout':
+            raise requests.Timeout(f'Timed out requesting {url}')
+        elif self.failure == 'error':
+            return FakeResponse(503)
+
+        parsedURL = urlparse(url)
+        query = {key: values[0].split(',') for key, values in parse_qs(parsedURL.query).items()}
+
+        if parsedURL.path.endswith('/ranking-items'):
+            stageID = parsedURL.path.split('/')[-2]
+            items = [item for item in self.season.rankingItems if item['stage_id'] == stageID]
+        elif parsedURL.path.endswith('/rounds'):
+            items = self.season.rounds
+        elif parsedURL.path.endswith('/matches'):
+            items = self.season.matches
+        else:
+            return FakeResponse(404)
+
+        filters = {
+            'stage_ids': 'stage_id',
+            'group_ids': 'group_id',
+            'round_ids': 'round_id',
+            'round_numbers': 'round_number'
+        }
+        for parameter, field in filters.items():
+            if parameter in query:
+                items = [item for item in items if str(item[field]) in query[parameter]]
+
+        # Applies the Range header the same way toornament does
+        rangeUnit, rangeValue = (headers or {}).get('Range', 'items=0-49').split('=')
+        first, last = [int(value) for value in rangeValue.split('-')]
+        page = items[first:last + 1]
+
+        return FakeResponse(206, page, {'Content-Range': f'{rangeUnit} {first}-{first + len(page) - 1}/{len(items)}'})
+
+
+# Writes the data files of a season into a folder and creates a Toornament client on them
+# Uses a temporary folder that is removed when the process exits if no folder is given
+def createToornament(season, enableAPI = True, folder = None):
+    if folder is None:
+        folder = tempfile.mkdtemp(prefix = 'leaguebot-bench-')
+        atexit.register(shutil.rmtree, folder, ignore_errors = True)
+
+    with io.open(os.path.join(folder, 'toornament.token'), 'w', encoding = 'utf-8') as tokenFile:
+        tokenFile.write('token\n123456\nBenchmark League\n')
+
+    with io.open(os.path.join(folder, 'Teams.csv'), 'w', encoding = 'utf-8') as teamsFile:
+        for teamName in season.teamNames:
+            teamsFile.write(f'{teamName};<:emote:1>;\n')
+
+    with io.open(os.path.join(folder, 'Stages.csv'), 'w', encoding = 'utf-8') as stagesFile:
+        for stageID, groupIDs in season.stages:
+            for groupID in groupIDs:
+                stagesFile.write(f'Stage {groupID};{stageID};{groupID};https://example.com/logo.png;FF0000;S{groupID}\n')
+
+    toornament = Toornament(folder, os.path.join(folder, 'toornament.token'), 'Teams.csv', 'Stages.csv', enableAPI = enableAPI)
+    toornament.session = FakeSession(season)
+
+    # Benchmarks don't need to respect the rate limit of the real API
+    toornament.cooldownAPI = lambda: None
+
+    return toornament
@@ -0,0 +1,71 @@
+# Measures append and lookup throughput of the snapshot history over a full season of snapshots
+#
+# Usage: python benchmarks/history_throughput.py [teamsPerGroup] [snapshotsPerWeek]
+
+import sys
+import time
+import random
+from fakeapi import FakeSeason, createToornament
+from toornament import Team, Ranking, Match
+
+
+def main():
+    teamsPerGroup = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    snapshotsPerWeek = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    season = FakeSeason(teamsPerGroup = teamsPerGroup)
+    toornament = createToornament(season, enableAPI = False)
+    stage = toornament.stages[0]
+    weekCount = max(match['round_number'] for match in season.matches)
+    teamNames = season.teamNames
+    random.seed(1)
+
+    # Every snapshot differs from the previous one, so none of them is skipped as duplicate
+    snapshots = []
+    for week in range(1, weekCount + 1):
+        for _ in range(snapshotsPerWeek):
+            ranking = Ranking(stage)
+            order = random.sample(teamNames, len(teamNames))
+            for position, teamName in enumerate(order):
+                team = Team()
+                team.name = teamName
+                team.position = position + 1
+                team.rank = position + 1
+                team.points = random.randint(0, 100)
+                ranking.teams += [team]
+
+            matches = [Match(number = number + 1, homeTeamName = order[2 * number], awayTeamName = order[2 * number + 1]) for number in range(len(order) // 2)]
+            snapshots += [(week, ranking, matches)]
+
+    startTime = time.perf_counter()
+    for week, ranking, matches in snapshots:
+        toornament.recordRanking(ranking, week)
+        toornament.recordMatches(stage, week, matches)
+    appendTime = time.perf_counter() - startTime
+
+    key = toornament.getStageKey(stage)
+    timestamps = [entry[0] for entry in toornament.history.getIndex(key)]
+
+    lookupCount = 10000
+    startTime = time.perf_counter()
+    for lookup in range(lookupCount):
+        toornament.getHistoricRanking(stage, week = lookup % weekCount + 1)
+    weekLookupTime = time.perf_counter() - startTime
+
+    startTime = time.perf_counter()
+    for lookup in range(lookupCount):
+        toornament.getHistoricRanking(stage, timestamp = timestamps[lookup * 7919 % len(timestamps)])
+    timeLookupTime = time.perf_counter() - startTime
+
+    startTime = time.perf_counter()
+    rankHistory = toornament.getRankHistory(stage, teamNames[0])
+    rankHistoryTime = time.perf_counter() - startTime
+
+    logBytes = sum(entry[4] for entry in toornament.history.getIndex(key))
+    print(f'{len(snapshots)} ranking and match snapshots of {teamsPerGroup} teams over {weekCount} weeks, {logBytes / 1024:.0f} KiB log')
+    print(f'Append:                  {2 * len(snapshots) / appendTime:,.0f} snapshots/s')
+    print(f'Standings as of week:    {lookupCount / weekLookupTime:,.0f} lookups/s')
+    print(f'Standings as of time:    {lookupCount / timeLookupTime:,.0f} lookups/s')
+    print(f'Rank over time series:   {len(rankHistory)} points in {rankHistoryTime * 1000:.1f}ms')
+
+main()
@@ -0,0 +1,202 @@
+# Microbenchmarks of the parsing, lookup, mapping and rendering hot paths of the Toornament client
+# Measures time and memory allocated by a single operation on generated data and compares them with stored baselines
+# Runs fully offline on a generated season, API responses are only used as JSON items and never requested
+#
+# Usage: python benchmarks/microbench.py [small|medium|large|all] [--save]
+#        python benchmarks/microbench.py stages groupsPerStage teamsPerGroup registryTeams [--save]
+#
+# --save stores the results as new baseline of the size in microbench_baseline.json
+# Baselines are only comparable to results of the same machine, save them again before comparing two commits elsewhere
+
+import os
+import gc
+import io
+import sys
+import json
+import time
+import platform
+import subprocess
+import tracemalloc
+from fakeapi import FakeSeason, createToornament
+from toornament import Ranking, Team, Match, TeamInfo
+
+
+# Data sizes: stages, groups per stage, teams per group and additional teams in the registry that don't play
+SIZES = {
+    'small': (1, 1, 8, 0),
+    'medium': (4, 2, 10, 200),
+    'large': (8, 4, 20, 2000)
+}
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'microbench_baseline.json')
+
+
+# Adds teams that aren't part of the season in front of the registry, like teams of past seasons in Teams.csv
+def extendRegistry(toornament, registryTeams):
+    formerTeams = [TeamInfo(f'Former Team {index}', '<:former:2>', f'FT{index}' if index % 3 == 0 else '') for index in range(registryTeams)]
+    toornament.teamInfos = formerTeams + toornament.teamInfos
+
+# Generates the fixtures of a week in the format of the text that is copied from toornament for the matches command
+# Played matches list both scores, unplayed ones end with a blank line
+def generateFixturesText(matchItems):
+    lines = []
+    for item in matchItems:
+        home, away = item['opponents']
+        lines += [home['participant']['name'], 'logo']
+        if item['status'] == 'completed':
+            lines += [str(home['score']), away['participant']['name'], 'logo', str(away['score'])]
+        else:
+            lines += [away['participant']['name'], 'logo', ' ']
+
+    return '\n'.join(lines)
+
+# Returns the benchmarks of one data size as tuples of name, operation and the arguments it is called with
+def createBenchmarks(stageCount, groupsPerStage, teamsPerGroup, registryTeams):
+    season = FakeSeason(stageCount, groupsPerStage, teamsPerGroup, playedRounds = teamsPerGroup - 1)
+    toornament = createToornament(season)
+    extendRegistry(toornament, registryTeams)
+    stage = toornament.stages[0]
+    stageID, groupIDs = season.stages[0]
+
+    # Models as the bot builds them from API responses
+    roundNumbers = {roundItem['id']: roundItem['number'] for roundItem in season.rounds}
+    rankingItems = [item for item in season.rankingItems if item['group_id'] == groupIDs[0]]
+    ranking = Ranking(stage)
+    ranking.teams = [toornament.parseTeamJSON(item) for item in rankingItems]
+    matches = [toornament.parseMatchJSON(item, roundNumbers) for item in season.matches]
+
+    teamLines = [team.toCSV() for team in ranking.teams]
+    matchLines = [match.toCSV() for match in matches]
+    lookupNames = [teamInfo.nickname if not teamInfo.nickname == '' else teamInfo.name for teamInfo in toornament.teamInfos[::max(1, len(toornament.teamInfos) // 100)]]
+    weekItems = [item for item in season.matches if item['group_id'] == groupIDs[0] and item['round_number'] == teamsPerGroup // 2]
+    fixturesText = generateFixturesText(weekItems)
+
+    def reportFixtures(text):
+        toornament.reportFixtures(stage.name, 1, text)
+
+    # Every operation is called once per argument
+    return [
+        ('Ranking.getRankingText', Ranking.getRankingText, [ranking]),
+        ('Toornament.getTeam', toornament.getTeam, lookupNames),
+        ('Team.fromCSV', lambda line: Team().fromCSV(line), teamLines),
+        ('Match.fromCSV', lambda line: Match().fromCSV(line), matchLines),
+        ('Toornament.parseTeamJSON', toornament.parseTeamJSON, rankingItems),
+        ('Toornament.parseMatchJSON', lambda item: toornament.parseMatchJSON(item, roundNumbers), season.matches),
+        ('Toornament.reportFixtures', reportFixtures, [fixturesText])
+    ]
+
+# Returns the time in nanoseconds and the allocated bytes per operation of a benchmark
+# Time is the best of several repeats with the garbage collector disabled, like timeit does
+# Memory is the peak of each call on its own, averaged over all arguments, so temporary objects count even if they are freed again
+def measure(operation, arguments, repeats = 5, minRepeatTime = 0.05):
+    def runAll():
+        for argument in arguments:
+            operation(argument)
+
+    runAll()
+
+    loops = 1
+    gc.disable()
+    try:
+        while True:
+            startTime = time.perf_counter()
+            for _ in range(loops):
+                runAll()
+            duration = time.perf_counter() - startTime
+            if duration >= minRepeatTime:
+                break
+            loops *= 2
+
+        durations = [duration]
+        for _ in range(repeats - 1):
+            startTime = time.perf_counter()
+            for _ in range(loops):
+                runAll()
+            durations += [time.perf_counter() - startTime]
+    finally:
+        gc.enable()
+
+    allocatedBytes = 0
+    tracemalloc.start()
+    try:
+        for argument in arguments:
+            currentBytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            operation(argument)
+            allocatedBytes += tracemalloc.get_traced_memory()[1] - currentBytes
+    finally:
+        tracemalloc.stop()
+
+    return min(durations) / (loops * len(arguments)) * 1e9, allocatedBytes / len(arguments)
+
+# Returns the stored baselines or an empty dictionary if none were saved yet
+def loadBaselines():
+    try:
+        with io.open(BASELINE_FILE, 'r', encoding = 'utf-8') as baselineFile:
+            return json.load(baselineFile)
+    except FileNotFoundError:
+        return {}
+
+# Stores the results of one size as its new baseline together with the commit and Python version they were measured on
+def saveBaseline(baselines, sizeName, results):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output = True, text = True, cwd = os.path.dirname(BASELINE_FILE)).stdout.strip()
+    except OSError:
+        commit = ''
+
+    baselines[sizeName] = {
+        'commit': commit,
+        'python': platform.python_version(),
+        'results': results
+    }
+
+    with io.open(BASELINE_FILE, 'w', encoding = 'utf-8') as baselineFile:
+        json.dump(baselines, baselineFile, indent = 2, sort_keys = True)
+        baselineFile.write('\n')
+
+# Runs all benchmarks of one size, prints them next to the baseline and returns the results
+def runSize(sizeName, size, baseline):
+    print(f'{sizeName}: {size[0]} stages, {size[1]} groups per stage, {size[2]} teams per group, {size[3]} additional registry teams')
+    if baseline is not None:
+        print(f"  baseline from {baseline['commit'] or 'unknown commit'} (Python {baseline['python']})")
+
+    results = {}
+    for name, operation, arguments in createBenchmarks(*size):
+        timePerOperation, bytesPerOperation = measure(operation, arguments)
+        results[name] = {'ns': round(timePerOperation, 1), 'bytes': round(bytesPerOperation, 1)}
+
+        line = f'  {name:<28} {timePerOperation:12,.0f} ns/op {bytesPerOperation:12,.0f} B/op'
+        if baseline is not None and name in baseline['results']:
+            baselineTime = baseline['results'][name]['ns']
+            baselineBytes = baseline['results'][name]['bytes']
+            line += f'   time {(timePerOperation / baselineTime - 1) * 100:+6.1f}%'
+            if baselineBytes > 0:
+                line += f'   memory {(bytesPerOperation / baselineBytes - 1) * 100:+6.1f}%'
+        print(line)
+
+    return results
+
+def main():
+    arguments = [argument for argument in sys.argv[1:] if not argument == '--save']
+    save = '--save' in sys.argv[1:]
+
+    if len(arguments) == 4:
+        sizes = {'custom_' + '_'.join(arguments): tuple(int(argument) for argument in arguments)}
+    elif len(arguments) == 0 or arguments[0] == 'all':
+        sizes = SIZES
+    elif arguments[0] in SIZES:
+        sizes = {arguments[0]: SIZES[arguments[0]]}
+    else:
+        sys.exit('Unknown size, expected one of ' + ', '.join(list(SIZES) + ['all']) + ' or four numbers')
+
+    baselines = loadBaselines()
+    for sizeName, size in sizes.items():
+        results = runSize(sizeName, size, baselines.get(sizeName))
+        if save:
+            saveBaseline(baselines, sizeName, results)
+
+    if save:
+        print(f'Saved baseline to {BASELINE_FILE}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+# Measures how long a week update takes before, during and after a toornament outage
+# and checks that stale data is served while the API is down
+#
+# Usage: python benchmarks/outage.py [timeoutSeconds]
+
+import sys
+import time
+import datetime
+from fakeapi import FakeSeason, createToornament
+
+
+# Runs one update like the update command does and returns its duration and whether the data was stale
+def timeUpdate(toornament, stage):
+    startTime = time.perf_counter()
+    week = toornament.getWeekInfo(stage)
+    return time.perf_counter() - startTime, week
+
+def main():
+    timeout = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+
+    season = FakeSeason(teamsPerGroup = 8, playedRounds = 2)
+    toornament = createToornament(season)
+    toornament.circuit.resetTimeout = 2.0
+    stage = toornament.stages[0]
+    session = toornament.session
+
+    duration, week = timeUpdate(toornament, stage)
+    print(f'Healthy:            {duration * 1000:7.1f}ms, stale: {week.stale}, {len(week.standings.teams)} teams')
+
+    # Every request hangs until the timeout, the first updates trip the circuit breaker
+    session.failure = 'timeout'
+    session.latency = timeout
+    toornament.fixtureRefreshTime = datetime.timedelta(0)
+    toornament.fixtureFullRefreshTime = datetime.timedelta(0)
+    for attempt in range(1, 4):
+        duration, week = timeUpdate(toornament, stage)
+        print(f'Outage, update {attempt}:   {duration * 1000:7.1f}ms, stale: {week.stale}, {len(week.standings.teams)} teams, circuit {toornament.circuit.state}')
+
+    # Revalidation doesn't call the API while the circuit is open
+    requestCount = session.requestCount
+    toornament.revalidate()
+    print(f'Revalidate (open):  {session.requestCount - requestCount} requests')
+
+    session.failure = None
+    session.latency = 0.0
+    time.sleep(toornament.circuit.resetTimeout)
+    print(f'Revalidate (reset): success: {toornament.revalidate()}, circuit {toornament.circuit.state}')
+
+    duration, week = timeUpdate(toornament, stage)
+    print(f'Recovered:          {duration * 1000:7.1f}ms, stale: {week.stale}, {len(week.standings.teams)} teams')
+
+main()
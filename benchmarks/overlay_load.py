@@ -0,0 +1,146 @@
+# Load test of the overlay HTTP API: measures requests per second, checks that no toornament API calls are made
+# and compares the latency of simulated Discord commands on the same event loop with and without overlay traffic
+# Load is generated by separate client processes so it doesn't compete with the bot for the event loop
+#
+# Usage: python benchmarks/overlay_load.py [seconds] [clientProcesses] [connectionsPerProcess]
+
+import sys
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from fakeapi import FakeSeason, createToornament
+from overlay import OverlayServer
+
+
+# Sends requests over one keep-alive connection until the time is up, every other request revalidates with an ETag
+async def runConnection(port, paths, duration, statusCounts):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    etags = {}
+    endTime = time.monotonic() + duration
+    requestNumber = 0
+
+    while time.monotonic() < endTime:
+        path = paths[requestNumber % len(paths)]
+        requestNumber += 1
+
+        request = f'GET {path} HTTP/1.1\r\nHost: localhost\r\nAccept-Encoding: gzip\r\n'
+        if path in etags and requestNumber % 2 == 0:
+            request += f'If-None-Match: {etags[path]}\r\n'
+        writer.write((request + '\r\n').encode('latin-1'))
+
+        lines = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        status = int(lines[0].split(' ')[1])
+        headers = {}
+        for line in lines[1:]:
+            name, separator, value = line.partition(':')
+            if separator:
+                headers[name.strip().lower()] = value.strip()
+
+        contentLength = int(headers.get('content-length', '0'))
+        if contentLength > 0:
+            await reader.readexactly(contentLength)
+        if 'etag' in headers:
+            etags[path] = headers['etag']
+
+        statusCounts[status] = statusCounts.get(status, 0) + 1
+
+    writer.close()
+
+# Runs in a client process, returns the number of responses by status code
+def runClients(port, paths, duration, connections):
+    statusCounts = {}
+
+    async def run():
+        await asyncio.gather(*[runConnection(port, paths, duration, statusCounts) for _ in range(connections)])
+
+    asyncio.run(run())
+    return statusCounts
+
+# Generates overlay traffic from several processes and returns the number of responses by status code
+async def generateLoad(port, paths, duration, processes, connections):
+    with ProcessPoolExecutor(max_workers = processes, mp_context = multiprocessing.get_context('spawn')) as executor:
+        futures = [asyncio.wrap_future(executor.submit(runClients, port, paths, duration, connections)) for _ in range(processes)]
+        results = await asyncio.gather(*futures)
+
+    statusCounts = {}
+    for result in results:
+        for status, count in result.items():
+            statusCounts[status] = statusCounts.get(status, 0) + count
+    return statusCounts
+
+# Runs a command like the update command every interval and returns how long each took after it was due
+# The time includes waiting for the event loop, which is where overlay traffic would slow down Discord commands
+async def measureCommands(toornament, stages, duration, interval = 0.02):
+    loop = asyncio.get_running_loop()
+    latencies = []
+    endTime = loop.time() + duration
+    commandNumber = 0
+
+    while loop.time() < endTime:
+        dueTime = loop.time() + interval
+        await asyncio.sleep(interval)
+
+        stage = stages[commandNumber % len(stages)]
+        commandNumber += 1
+        week = toornament.getWeekInfo(stage)
+        week.standings.getRankingText()
+        week.getMatchesText()
+
+        latencies += [loop.time() - dueTime]
+
+    return latencies
+
+# Returns the given percentile of a list of durations in milliseconds
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] * 1000
+
+def printLatencies(label, latencies):
+    print(f'  {label:<20} p50 {percentile(latencies, 0.5):6.2f}ms  p99 {percentile(latencies, 0.99):6.2f}ms  max {max(latencies) * 1000:6.2f}ms ({len(latencies)} commands)')
+
+async def run(duration, processes, connections):
+    season = FakeSeason(stageCount = 4, groupsPerStage = 2, teamsPerGroup = 10, playedRounds = 5)
+    toornament = createToornament(season)
+    stages = toornament.stages
+
+    # Fills the caches like the bot does after its first updates
+    toornament.getWeekInfos(stages)
+
+    paths = ['/stages']
+    for stage in stages:
+        paths += [f'/stages/{stage.alias}', f'/stages/{stage.alias}/ranking', f'/stages/{stage.alias}/matches', f'/stages/{stage.alias}/weeks/3']
+
+    server = OverlayServer(toornament, port = 0)
+    port = await server.start()
+
+    # Overlay traffic alone must not cause any toornament API calls
+    upstreamBefore = toornament.session.requestCount
+    statusCounts = await generateLoad(port, paths, duration, processes, connections)
+    upstreamRequests = toornament.session.requestCount - upstreamBefore
+
+    responses = sum(statusCounts.values())
+    print(f'Overlay API, {processes * connections} connections for {duration:.0f}s:')
+    print(f'  {responses / duration:,.0f} requests/s, responses by status: {dict(sorted(statusCounts.items()))}')
+    print(f'  toornament API calls caused by overlay requests: {upstreamRequests}')
+
+    # Discord command latency without and with overlay traffic on the same event loop
+    print('Command latency:')
+    printLatencies('idle', await measureCommands(toornament, stages, duration))
+
+    load = asyncio.ensure_future(generateLoad(port, paths, duration, processes, connections))
+    latencies = await measureCommands(toornament, stages, duration)
+    await load
+    printLatencies('under overlay load', latencies)
+
+    await server.stop()
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    connections = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+
+    asyncio.run(run(duration, processes, connections))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+# Compares how many toornament API requests one season of weekly updates costs
+# with the old per-week round_numbers query and with the whole-stage fixture index
+#
+# Usage: python benchmarks/requests_per_season.py [teamsPerGroup] [postsPerWeek]
+
+import sys
+import datetime
+from fakeapi import FakeSeason, createToornament
+
+
+# Old behaviour: one matches request filtered by round number for every posted week
+def runPerWeekQuery(toornament, stage, week):
+    requestURL = f'https://api.toornament.com/viewer/v2/tournaments/{toornament.tournamentID}/matches?round_numbers={week}&stage_ids={stage.id}'
+    if not stage.groupID == '':
+        requestURL += f'&group_ids={stage.groupID}'
+    return toornament.getAllItems(requestURL, 'matches')
+
+def main():
+    teamsPerGroup = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    postsPerWeek = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    season = FakeSeason(teamsPerGroup = teamsPerGroup)
+    weekCount = max(match['round_number'] for match in season.matches)
+
+    perWeekClient = createToornament(season)
+    indexClient = createToornament(season)
+
+    stage = indexClient.stages[0]
+    for week in range(1, weekCount + 1):
+        for post in range(postsPerWeek):
+            # The refresh interval has passed before the first post of a week, the other posts follow within it
+            if post == 0:
+                indexClient.fixtureRefreshTime = datetime.timedelta(0)
+            else:
+                indexClient.fixtureRefreshTime = datetime.timedelta(hours = 1)
+
+            runPerWeekQuery(perWeekClient, stage, week)
+            indexClient.getMatches(stage, week)
+        season.completeRound(week)
+
+    print(f'Season: {weekCount} weeks, {len(season.matches)} matches, {postsPerWeek} posts per week')
+    print(f'Per-week round_numbers query: {perWeekClient.session.requestCount} requests')
+    print(f'Whole-stage fixture index:    {indexClient.session.requestCount} requests')
+
+main()
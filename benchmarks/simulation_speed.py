@@ -0,0 +1,52 @@
+# Measures simulated seasons per second of the playoff odds simulation for leagues of different sizes
+# and compares them with simulating one season at a time with Team objects and sorted
+#
+# Usage: python benchmarks/simulation_speed.py [simulations] [processes]
+
+import sys
+import copy
+import time
+import random
+from fakeapi import FakeSeason, createToornament
+from simulation import SeasonSimulation
+
+
+# Simulates seasons one by one with the existing Team objects, only wins are simulated
+def simulateWithObjects(ranking, matches, simulations):
+    remainingMatches = [match for match in matches if match.pending]
+    for _ in range(simulations):
+        teams = {team.name: copy.copy(team) for team in ranking.teams}
+        for match in remainingMatches:
+            winner = match.homeTeamName if random.random() < 0.5 else match.awayTeamName
+            teams[winner].wins += 1
+            teams[winner].points += 3
+        sorted(teams.values(), key = lambda team: (-team.points, -team.wins, -team.gameDifference))
+
+def main():
+    simulations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+    for teamsPerGroup in [8, 12, 20]:
+        season = FakeSeason(teamsPerGroup = teamsPerGroup, playedRounds = teamsPerGroup - 1)
+        toornament = createToornament(season)
+        stage = toornament.stages[0]
+        ranking = toornament.getRanking(stage)
+        matches = toornament.getStageMatches(stage)
+
+        startTime = time.perf_counter()
+        simulation = SeasonSimulation(ranking, matches, winsNeeded = 3)
+        result = simulation.run(simulations, processes = processes, seed = 1)
+        vectorizedTime = time.perf_counter() - startTime
+
+        objectSimulations = max(1, simulations // 100)
+        startTime = time.perf_counter()
+        simulateWithObjects(ranking, matches, objectSimulations)
+        objectTime = time.perf_counter() - startTime
+
+        print(f'{teamsPerGroup} teams, {simulation.getRemainingMatchCount()} remaining matches:')
+        print(f'  NumPy batched ({processes} process): {simulations / vectorizedTime:12,.0f} seasons/s')
+        print(f'  Team objects and sorted:      {objectSimulations / objectTime:12,.0f} seasons/s (wins only)')
+        print(f'  Playoff odds of the leader:   {result.getPlayoffOdds(4)[0] * 100:.1f}%')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import io
+import re
+import time
+import asyncio
+import collections
+
+
+# List of Discord channel IDs per stage name, saved as CSV file with one stageName;channelID per line
+class ChannelList:
+
+    def __init__(self, baseFolder, fileName):
+        self.filePath = baseFolder + fileName
+        self.channels = {}
+
+        # The file doesn't exist until the first channel was added
+        try:
+            file = io.open(self.filePath, 'r', encoding = 'utf-8')
+
+            for line in file:
+                splitInfo = re.split(';', line.rstrip('\n'))
+                if len(splitInfo) < 2:
+                    continue
+                self.channels.setdefault(splitInfo[0].strip(), set()).add(int(splitInfo[1].strip()))
+
+            file.close()
+        except FileNotFoundError:
+            pass
+
+    # Returns the IDs of all channels of a stage
+    def get(self, stageName):
+        return sorted(self.channels.get(stageName, set()))
+
+    # Returns the names of all stages that have at least one channel
+    def getStageNames(self):
+        return [stageName for stageName, channelIDs in self.channels.items() if not len(channelIDs) == 0]
+
+    # Adds a channel to a stage
+    def add(self, stageName, channelID):
+        self.channels.setdefault(stageName, set()).add(channelID)
+        return self.save()
+
+    # Removes a channel from a stage
+    def remove(self, stageName, channelID):
+        self.channels.get(stageName, set()).discard(channelID)
+        return self.save()
+
+    # Saves the channel list
+    def save(self):
+        try:
+            file = io.open(self.filePath, 'w', encoding = 'utf-8')
+
+            for stageName, channelIDs in self.channels.items():
+                for channelID in sorted(channelIDs):
+                    file.write(f'{stageName};{channelID}\n')
+
+            file.close()
+            return True
+        except:
+            print(f'Error writing channel list {self.filePath}')
+            return False
+
+
+# Allows at most a certain number of calls per period, callers wait until the next call is allowed
+class RateLimitBucket:
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+        self.calls = collections.deque()
+        self.lock = asyncio.Lock()
+
+    # Waits until another call fits into the bucket and reserves it
+    async def acquire(self):
+        async with self.lock:
+            now = time.monotonic()
+            while len(self.calls) > 0 and self.calls[0] + self.period <= now:
+                self.calls.popleft()
+
+            if len(self.calls) >= self.limit:
+                await asyncio.sleep(self.calls[0] + self.period - now)
+                self.calls.popleft()
+
+            self.calls.append(time.monotonic())
+
+
+# Result of one broadcast, lists which channels received their messages and which failed
+class DeliveryReport:
+
+    def __init__(self):
+        self.sent = {}
+        self.errors = {}
+        self.duration = 0.0
+
+    # Returns IDs of all channels that received all of their messages
+    def getDelivered(self):
+        return [channelID for channelID in self.sent if not channelID in self.errors]
+
+    # Returns a short summary of the broadcast that can be posted in Discord
+    def toString(self):
+        channelCount = len(self.sent)
+        msg = f'Delivered to {len(self.getDelivered())}/{channelCount} channels in {self.duration:.1f}s.'
+
+        if not len(self.errors) == 0:
+            failures = ', '.join(f'{channelID} ({error})' for channelID, error in sorted(self.errors.items()))
+            msg += f' Failed: {failures}'
+
+        return msg
+
+
+# Sends messages to many Discord channels concurrently while respecting the Discord rate limits
+# Messages of one channel are sent in order, failures in one channel don't affect the others
+class Broadcaster:
+
+    def __init__(self, getChannel, channelLimit = 5, channelPeriod = 5.0, globalLimit = 50, globalPeriod = 1.0, timeout = 30.0):
+        self.getChannel = getChannel
+        self.channelLimit = channelLimit
+        self.channelPeriod = channelPeriod
+        self.globalBucket = RateLimitBucket(globalLimit, globalPeriod)
+        self.channelBuckets = {}
+        self.timeout = timeout
+
+    # Returns the rate limit bucket of a channel
+    def getChannelBucket(self, channelID):
+        if not channelID in self.channelBuckets:
+            self.channelBuckets[channelID] = RateLimitBucket(self.channelLimit, self.channelPeriod)
+        return self.channelBuckets[channelID]
+
+    # Sends the same messages to all given channels
+    # Every message is a dictionary of arguments for channel.send, e.g. {'embed': embed}
+    async def broadcast(self, channelIDs, messages):
+        return await self.deliver({channelID: messages for channelID in channelIDs})
+
+    # Sends a list of messages to every channel of the dictionary and returns a delivery report
+    async def deliver(self, channelMessages):
+        report = DeliveryReport()
+        startTime = time.monotonic()
+
+        await asyncio.gather(*[self.deliverToChannel(channelID, messages, report) for channelID, messages in channelMessages.items()])
+
+        report.duration = time.monotonic() - startTime
+        return report
+
+    # Sends all messages to one channel and records the outcome in the report
+    async def deliverToChannel(self, channelID, messages, report):
+        report.sent[channelID] = 0
+
+        channel = self.getChannel(channelID)
+        if channel is None:
+            report.errors[channelID] = 'unknown channel'
+            return
+
+        bucket = self.getChannelBucket(channelID)
+        try:
+            for message in messages:
+                await bucket.acquire()
+                await self.globalBucket.acquire()
+                await asyncio.wait_for(channel.send(**message), self.timeout)
+                report.sent[channelID] += 1
+        except asyncio.TimeoutError:
+            report.errors[channelID] = 'timeout'
+        except Exception as e:
+            report.errors[channelID] = type(e).__name__
@@ -0,0 +1,198 @@
+import copy
+from broadcast import ChannelList
+
+
+# A single change between two snapshots of a stage, e.g. a new result or a rank movement
+class ResultEvent:
+
+    NEW_RESULT = 'result'
+    CORRECTION = 'correction'
+    FORFEIT = 'forfeit'
+    RANK_CHANGE = 'rank'
+
+    def __init__(self, kind, stage, match = None, previousMatch = None, teamName = '', previousRank = -1, rank = -1):
+        self.kind = kind
+        self.stage = stage
+        self.match = match
+        self.previousMatch = previousMatch
+        self.teamName = teamName
+        self.previousRank = previousRank
+        self.rank = rank
+
+    # Returns a short line describing the change, e.g. "Team A 2-1 Team B"
+    def toString(self):
+        if self.kind == ResultEvent.RANK_CHANGE:
+            direction = 'up' if self.rank < self.previousRank else 'down'
+            return f'{self.teamName} moved {direction} from #{self.previousRank} to #{self.rank}'
+
+        # Match.toString fills in forfeit scores, so it only gets called on copies
+        matchStr = copy.copy(self.match).toString()
+
+        if self.kind == ResultEvent.CORRECTION:
+            previous = copy.copy(self.previousMatch)
+            previous.toString()
+            return f'Correction: {matchStr} (was {previous.homeScore}-{previous.awayScore})'
+        elif self.kind == ResultEvent.FORFEIT:
+            return f'{matchStr} (forfeit)'
+
+        return matchStr
+
+
+# Compares consecutive match and ranking snapshots of stages and reports what changed
+# Matches are identified by stage, group and match number, teams in rankings by their name
+class ChangeDetector:
+
+    def __init__(self):
+        self.matchStates = {}
+        self.rankStates = {}
+
+    # Returns the key that identifies a match across snapshots
+    def getMatchKey(self, stage, match):
+        groupID = match.groupID if not match.groupID == '' else stage.groupID
+        return (stage.id, groupID, match.number)
+
+    # Compares the given matches with their last known state and returns events for all changed results
+    # Matches seen for the first time only set the baseline, so only the given matches are looked at
+    def compareMatches(self, stage, matches):
+        events = []
+
+        for match in matches:
+            key = self.getMatchKey(stage, match)
+            previous = self.matchStates.get(key)
+            self.matchStates[key] = match
+
+            if previous is None or match.pending:
+                continue
+
+            forfeit = match.homeForfeit or match.awayForfeit
+            if previous.pending:
+                kind = ResultEvent.FORFEIT if forfeit else ResultEvent.NEW_RESULT
+                events += [ResultEvent(kind, stage, match = match)]
+            elif not previous.getResultState() == match.getResultState():
+                previousForfeit = previous.homeForfeit or previous.awayForfeit
+                kind = ResultEvent.FORFEIT if forfeit and not previousForfeit else ResultEvent.CORRECTION
+                events += [ResultEvent(kind, stage, match = match, previousMatch = previous)]
+
+        return events
+
+    # Compares a ranking with the previous ranking of the same stage and returns events for all rank movements
+    def compareRanking(self, ranking):
+        stage = ranking.stage
+        key = (stage.id, stage.groupID)
+        ranks = {team.name: team.rank for team in ranking.teams}
+
+        previousRanks = self.rankStates.get(key)
+        self.rankStates[key] = ranks
+
+        # Empty rankings are most likely API errors and shouldn't reset the baseline
+        if previousRanks is None or ranks == {}:
+            if ranks == {} and previousRanks is not None:
+                self.rankStates[key] = previousRanks
+            return []
+
+        events = []
+        for team in ranking.teams:
+            previousRank = previousRanks.get(team.name)
+            if previousRank is not None and not previousRank == team.rank:
+                events += [ResultEvent(ResultEvent.RANK_CHANGE, stage, teamName = team.name, previousRank = previousRank, rank = team.rank)]
+
+        return events
+
+
+# Joins the events into as few Discord messages as possible, grouped by stage
+def batchMessages(events, maxLength = 2000):
+    messages = []
+    message = ''
+    currentStage = None
+
+    for event in events:
+        line = event.toString() + '\n'
+        if not event.stage is currentStage:
+            line = f'**{event.stage.name}**\n' + line
+
+        # Starts a new message if the line doesn't fit anymore and repeats the stage header
+        if len(message) + len(line) > maxLength and not message == '':
+            messages += [message.rstrip('\n')]
+            message = ''
+            if event.stage is currentStage:
+                line = f'**{event.stage.name}**\n' + line
+
+        message += line
+        currentStage = event.stage
+
+    if not message == '':
+        messages += [message.rstrip('\n')]
+
+    return messages
+
+
+# Polls the stages that have feed channels and collects the result events for those channels
+class ResultFeed:
+
+    def __init__(self, toornament, feedsFile):
+        self.toornament = toornament
+        self.channels = ChannelList(toornament.baseFolder, feedsFile)
+        self.detector = ChangeDetector()
+        self.indexes = {}
+
+    # Subscribes a channel to the results of a stage
+    def addChannel(self, stageName, channelID):
+        stage = self.toornament.getStage(stageName)
+        if stage is None:
+            return False
+
+        return self.channels.add(stage.name, channelID)
+
+    # Unsubscribes a channel from the results of a stage
+    def removeChannel(self, stageName, channelID):
+        stage = self.toornament.getStage(stageName)
+        if stage is None:
+            return False
+
+        return self.channels.remove(stage.name, channelID)
+
+    # Returns the matches of a stage that may have changed since the last poll
+    # Only the changes recorded by the given fixture index are returned unless the index was rebuilt
+    def getChangedMatches(self, stage, index):
+        if not self.toornament.enableAPI:
+            matches = self.toornament.getMatches(stage, self.toornament.getCurrentWeek(stage))
+            return matches if isinstance(matches, list) else []
+
+        if index is None:
+            return []
+
+        key = (stage.id, stage.groupID)
+        if not self.indexes.get(key) is index:
+            self.indexes[key] = index
+            index.popChanges()
+            return list(index.matches.values())
+
+        return [match for previous, match in index.popChanges()]
+
+    # Polls all subscribed stages and returns the messages to send, keyed by channel ID
+    def poll(self):
+        stages = []
+        for stageName in self.channels.getStageNames():
+            stage = self.toornament.getStage(stageName)
+            if stage is not None:
+                stages += [stage]
+
+        if stages == []:
+            return {}
+
+        # Fetches the rankings and fixtures of all stages in as few API calls as possible
+        # Refreshes all unfinished rounds and the last played ones, so postponed matches and corrections are reported too
+        rankings = self.toornament.getRankings(stages)
+        indexes = {}
+        if self.toornament.enableAPI:
+            indexes = self.toornament.getFixtureIndexes(stages, feed = True)
+
+        channelEvents = {}
+        for stage, ranking in zip(stages, rankings):
+            events = self.detector.compareMatches(stage, self.getChangedMatches(stage, indexes.get((stage.id, stage.groupID))))
+            events += self.detector.compareRanking(ranking)
+
+            for channelID in self.channels.get(stage.name):
+                channelEvents.setdefault(channelID, []).extend(events)
+
+        return {channelID: batchMessages(events) for channelID, events in channelEvents.items() if not events == []}
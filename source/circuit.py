@@ -0,0 +1,42 @@
+import time
+
+
+# Stops calls to an endpoint after several failures in a row so callers fail fast during outages
+# After the reset timeout a single trial call is let through, which closes the circuit again if it succeeds
+class CircuitBreaker:
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failureThreshold = 3, resetTimeout = 60.0):
+        self.failureThreshold = failureThreshold
+        self.resetTimeout = resetTimeout
+        self.state = CircuitBreaker.CLOSED
+        self.failures = 0
+        self.openedAt = 0.0
+
+    # Returns whether a call may be made right now
+    def allowRequest(self):
+        if self.state == CircuitBreaker.OPEN:
+            if time.monotonic() - self.openedAt < self.resetTimeout:
+                return False
+            self.state = CircuitBreaker.HALF_OPEN
+
+        return True
+
+    # Closes the circuit after a successful call
+    def recordSuccess(self):
+        self.failures = 0
+        self.state = CircuitBreaker.CLOSED
+
+    # Counts a failed call and opens the circuit if there were too many or the trial call failed
+    def recordFailure(self):
+        self.failures += 1
+        if self.state == CircuitBreaker.HALF_OPEN or self.failures >= self.failureThreshold:
+            self.state = CircuitBreaker.OPEN
+            self.openedAt = time.monotonic()
+
+    # Returns whether calls are currently blocked
+    def isOpen(self):
+        return self.state == CircuitBreaker.OPEN and time.monotonic() - self.openedAt < self.resetTimeout
@@ -0,0 +1,231 @@
+import os
+import io
+import mmap
+import time
+import struct
+import bisect
+
+
+# Entry of the offset index of a snapshot log: timestamp, week, snapshot kind, offset and length in the log
+INDEX_ENTRY = struct.Struct('<dHBQI')
+
+
+# Append-only history of snapshots, one binary log and one offset index file per stage group
+# Snapshots are stored as opaque payloads, reading is done through a memory map of the log
+class SnapshotLog:
+
+    RANKING = 0
+    MATCHES = 1
+
+    def __init__(self, folder, maxBytes = 16 * 1024 * 1024, maxAge = 365 * 24 * 3600):
+        self.folder = folder
+        if not self.folder.endswith('/'):
+            self.folder += '/'
+
+        # Logs are compacted once they grow beyond maxBytes, snapshots older than maxAge seconds are dropped then
+        self.maxBytes = maxBytes
+        self.maxAge = maxAge
+
+        self.indexes = {}
+        self.weekEntries = {}
+        self.maps = {}
+        self.lastPayloads = {}
+
+        os.makedirs(self.folder, exist_ok = True)
+
+    # Returns the paths of the log and index file of a stage group
+    def getPaths(self, key):
+        name = '_'.join(key)
+        return self.folder + name + '.log', self.folder + name + '.idx'
+
+    # Returns the path of the file that marks a compaction whose new files are complete but may not be swapped in yet
+    def getMarkerPath(self, key):
+        return self.folder + '_'.join(key) + '.compact'
+
+    # Returns the offset index of a stage group, loads it from disk on first access
+    # Every entry is a tuple of timestamp, week, kind, offset and length, ordered by time of appending
+    def getIndex(self, key):
+        if not key in self.indexes:
+            entries = []
+            logPath, indexPath = self.getPaths(key)
+
+            # Finishes a compaction that was interrupted while swapping the files
+            # Without the marker the new files may be incomplete, the old ones are still untouched then
+            if os.path.exists(self.getMarkerPath(key)):
+                self.swapCompactedFiles(key)
+            else:
+                for path in [logPath + '.tmp', indexPath + '.tmp']:
+                    if os.path.exists(path):
+                        os.remove(path)
+
+            try:
+                with io.open(indexPath, 'rb') as indexFile:
+                    data = indexFile.read()
+
+                # Ignores a partially written last entry
+                usableSize = len(data) - len(data) % INDEX_ENTRY.size
+                entries = list(INDEX_ENTRY.iter_unpack(data[:usableSize]))
+            except FileNotFoundError:
+                pass
+
+            self.setIndex(key, entries)
+
+        return self.indexes[key]
+
+    # Replaces the offset index of a stage group and rebuilds the lookup of the last entry per kind and week
+    def setIndex(self, key, entries):
+        self.indexes[key] = entries
+        self.weekEntries[key] = {}
+        for entry in entries:
+            self.weekEntries[key].setdefault(entry[2], {})[entry[1]] = entry
+
+    # Appends a snapshot payload to the log of a stage group
+    # Skips snapshots that are identical to the last snapshot of the same kind
+    def append(self, key, kind, week, payload, timestamp = None):
+        if timestamp is None:
+            timestamp = time.time()
+
+        index = self.getIndex(key)
+        if not (key, kind) in self.lastPayloads:
+            lastEntry = self.findByTime(key, kind, float('inf'))
+            if lastEntry is not None:
+                self.lastPayloads[(key, kind)] = (lastEntry[1], self.read(key, lastEntry))
+
+        if self.lastPayloads.get((key, kind)) == (week, payload):
+            return False
+
+        logPath, indexPath = self.getPaths(key)
+        with io.open(logPath, 'ab') as logFile:
+            offset = logFile.tell()
+            logFile.write(payload)
+
+        entry = (timestamp, week, kind, offset, len(payload))
+        with io.open(indexPath, 'ab') as indexFile:
+            indexFile.write(INDEX_ENTRY.pack(*entry))
+
+        index.append(entry)
+        self.weekEntries[key].setdefault(kind, {})[week] = entry
+        self.lastPayloads[(key, kind)] = (week, payload)
+
+        if offset + len(payload) > self.maxBytes:
+            self.compact(key)
+
+        return True
+
+    # Reads the payload of an index entry through the memory map of the log
+    def read(self, key, entry):
+        end = entry[3] + entry[4]
+
+        # Maps the log again if it grew since it was mapped
+        logMap = self.maps.get(key)
+        if logMap is None or len(logMap) < end:
+            if logMap is not None:
+                logMap.close()
+
+            logPath, indexPath = self.getPaths(key)
+            with io.open(logPath, 'rb') as logFile:
+                logMap = mmap.mmap(logFile.fileno(), 0, access = mmap.ACCESS_READ)
+            self.maps[key] = logMap
+
+        return logMap[entry[3]:end]
+
+    # Returns the last entry of a kind that was appended at or before the given timestamp
+    def findByTime(self, key, kind, timestamp):
+        index = self.getIndex(key)
+
+        # Entries are appended in time order, so the timestamps can be searched with bisection
+        position = bisect.bisect_right(index, (timestamp, float('inf')))
+        for entry in reversed(index[:position]):
+            if entry[2] == kind:
+                return entry
+
+        return None
+
+    # Returns the last entry of a kind that belongs to the highest week up to the given week
+    def findByWeek(self, key, kind, week):
+        self.getIndex(key)
+        entries = self.weekEntries[key].get(kind, {})
+
+        weeks = [entryWeek for entryWeek in entries if entryWeek <= week]
+        if weeks == []:
+            return None
+
+        return entries[max(weeks)]
+
+    # Returns the payload of the snapshot of a stage group as of a week or timestamp, the latest if neither is given
+    def get(self, key, kind, week = None, timestamp = None):
+        if week is not None:
+            entry = self.findByWeek(key, kind, week)
+        else:
+            entry = self.findByTime(key, kind, float('inf') if timestamp is None else timestamp)
+
+        if entry is None:
+            return None
+
+        return self.read(key, entry)
+
+    # Returns all snapshots of a kind of a stage group as tuples of timestamp, week and payload
+    def getAll(self, key, kind):
+        return [(entry[0], entry[1], self.read(key, entry)) for entry in self.getIndex(key) if entry[2] == kind]
+
+    # Rewrites the log of a stage group without snapshots older than maxAge
+    # Only the last snapshot of every kind and week is kept for weeks that are over
+    # Drops the oldest snapshots if the log would still take more than half of maxBytes
+    def compact(self, key):
+        index = self.getIndex(key)
+        if index == []:
+            return
+
+        cutoff = time.time() - self.maxAge
+        currentWeek = max(entry[1] for entry in index)
+
+        lastEntries = {}
+        for position, entry in enumerate(index):
+            lastEntries[(entry[2], entry[1])] = position
+
+        keptEntries = []
+        for position, entry in enumerate(index):
+            if entry[0] < cutoff:
+                continue
+            if entry[1] < currentWeek and not lastEntries[(entry[2], entry[1])] == position:
+                continue
+            keptEntries += [entry]
+
+        keptBytes = sum(entry[4] for entry in keptEntries)
+        while keptBytes > self.maxBytes // 2 and len(keptEntries) > 1:
+            keptBytes -= keptEntries.pop(0)[4]
+
+        # Writes the new files next to the old ones and swaps them, so readers never see a half written log
+        logPath, indexPath = self.getPaths(key)
+        newIndex = []
+        with io.open(logPath + '.tmp', 'wb') as logFile, io.open(indexPath + '.tmp', 'wb') as indexFile:
+            for entry in keptEntries:
+                payload = self.read(key, entry)
+                newEntry = (entry[0], entry[1], entry[2], logFile.tell(), len(payload))
+                logFile.write(payload)
+                indexFile.write(INDEX_ENTRY.pack(*newEntry))
+                newIndex += [newEntry]
+
+            logFile.flush()
+            indexFile.flush()
+            os.fsync(logFile.fileno())
+            os.fsync(indexFile.fileno())
+
+        # Log and index can't be swapped at once, the marker lets getIndex finish the swap after a crash in between
+        with io.open(self.getMarkerPath(key), 'wb') as markerFile:
+            os.fsync(markerFile.fileno())
+
+        if key in self.maps:
+            self.maps.pop(key).close()
+
+        self.swapCompactedFiles(key)
+        self.setIndex(key, newIndex)
+
+    # Replaces log and index of a stage group with their compacted versions and removes the compaction marker
+    def swapCompactedFiles(self, key):
+        logPath, indexPath = self.getPaths(key)
+        for path in [logPath, indexPath]:
+            if os.path.exists(path + '.tmp'):
+                os.replace(path + '.tmp', path)
+
+        os.remove(self.getMarkerPath(key))
@@ -1,13 +1,19 @@
 import discord
 from discord import Colour, Embed
-from discord.ext import commands
+from discord.ext import commands, tasks
 import sys
 import re
+import threading
 from toornament import Toornament
 from toornament import Ranking
 from toornament import Team
 from toornament import Stage
 from toornament import Week
+from changes import ResultFeed
+from broadcast import Broadcaster, ChannelList
+from workqueue import WorkQueue, QueueFullError
+from simulation import SeasonSimulation
+from overlay import OverlayServer
 
 def main():
 
@@ -29,14 +35,39 @@ def main():
     # Initializes Bot
     bot = commands.Bot(command_prefix='.ecc')
 
+    # Blocking toornament calls run in worker threads, the lock makes sure they don't change the shared caches at the same time
+    toornamentLock = threading.Lock()
 
-    #### HELPER FUNCTIONS ####
+    # Initializes live result feed for subscribed channels
+    resultFeed = ResultFeed(toornament, 'Feeds.csv')
+
+    # Initializes concurrent delivery to many channels and the broadcast targets of every stage
+    broadcaster = Broadcaster(bot.get_channel)
+    broadcastTargets = ChannelList(toornament.baseFolder, 'Broadcasts.csv')
+
+    # Initializes channels that are told about problems with data files that were edited while the bot runs
+    adminChannels = ChannelList(toornament.baseFolder, 'AdminChannels.csv')
+
+    # Initializes the optional read-only HTTP API for stream overlays, enabled by an Overlay.cfg file containing host;port
+    overlayServer = None
+    try:
+        overlayFile = open('Overlay.cfg', 'r')
+        overlayHost, overlayPort = re.split(';', overlayFile.read().strip())
+        overlayFile.close()
+        overlayServer = OverlayServer(toornament, overlayHost.strip(), int(overlayPort), lock = toornamentLock)
+    except FileNotFoundError:
+        pass
+    except ValueError:
+        print('Invalid overlay config, expected host;port')
 
-    # Function to generate embed for one stage group
-    def generateEmbed(week, stageName):
-        stage = toornament.getStage(stageName)
-        weekInfo = toornament.getWeekInfo(stage, int(week))
+    # Initializes queue that merges identical update requests and limits how many run at the same time
+    workQueue = WorkQueue(maxSize = 20, concurrency = 2)
 
+
+    #### HELPER FUNCTIONS ####
+
+    # Function to generate embed for one stage group out of its week information
+    def generateEmbed(stage, weekInfo):
         embed = Embed(
             title = stage.name,
             type = 'rich',
@@ -46,11 +77,18 @@ def main():
         embed.set_thumbnail(url = stage.logoURL)
         embed.set_footer(text = toornament.tournamentName, icon_url = 'https://i.imgur.com/u2HPdEi.png')
 
-        standingsText = '```' + weekInfo.standings.getRankingText() + '```'  
+        # Warns that toornament couldn't be reached and the shown data is outdated
+        if weekInfo.stale:
+            embed.description = f'⚠️ toornament is currently unavailable, showing data from {weekInfo.getAgeText()} ago.'
+
+        if weekInfo.standings.stale and len(weekInfo.standings.teams) == 0:
+            standingsText = 'Currently unavailable'
+        else:
+            standingsText = '```' + weekInfo.standings.getRankingText() + '```'  
         embed.add_field(name = f'Standings', value = standingsText, inline = False)
 
         matchesText = weekInfo.getMatchesText()
-        embed.add_field(name = f'Matches (Week {int(week)})', value = matchesText, inline = False)
+        embed.add_field(name = f'Matches (Week {weekInfo.number})', value = matchesText, inline = False)
 
         return embed
     
@@ -74,6 +112,116 @@ def main():
                 return True
         return False
 
+    # Splits the arguments of the update commands into week and stage names
+    # The week is optional and is None if only the stage names were given
+    def splitWeekArgs(weekOrStages, stageNames):
+        if stageNames is None:
+            return None, weekOrStages
+        return weekOrStages, stageNames
+
+    # Returns the stages of a semicolon separated list of stage names
+    def getStages(stageNames):
+        return [toornament.getStage(stageName) for stageName in re.split(';', stageNames)]
+
+    # Runs a blocking toornament call in a worker thread so API calls and cooldowns don't block the event loop
+    async def runToornament(function, *args):
+        def run():
+            with toornamentLock:
+                return function(*args)
+
+        return await bot.loop.run_in_executor(None, run)
+
+    # Submits work to the work queue and waits until it ran
+    # Replies to the command and returns False as first value if the queue is full
+    async def submitWork(ctx, key, priority, work):
+        try:
+            return True, await workQueue.submit(key, priority, work)
+        except QueueFullError:
+            await ctx.send("I'm busy with other updates right now, please try again in a moment.")
+            return False, None
+
+    # Posts ranking and upcoming fixtures of the given stages in the channel of the command through the work queue
+    # Posts of a single stage run before bulk posts, identical posts for the same channel are only made once
+    async def queuePost(ctx, week, stageNames):
+        stages = getStages(stageNames)
+
+        async def post():
+            # Fetches all stages together so groups of the same stage share their API calls
+            weekInfos = await runToornament(toornament.getWeekInfos, stages, week)
+            for stage, weekInfo in zip(stages, weekInfos):
+                await ctx.send(embed = generateEmbed(stage, weekInfo))
+            await ctx.send(embed = generateToornamentEmbed())
+
+        key = ('post', tuple(stage.name for stage in stages), week, ctx.channel.id)
+        priority = WorkQueue.HIGH if len(stages) == 1 else WorkQueue.LOW
+        success, result = await submitWork(ctx, key, priority, post)
+        return success
+
+    #### TASKS ####
+
+    # Polls toornament for new results and rank changes and posts them in the subscribed channels
+    @tasks.loop(minutes = 1)
+    async def postResults():
+        try:
+            channelMessages = await runToornament(resultFeed.poll)
+        except Exception as e:
+            print(f'Error polling results: {e}')
+            return
+
+        report = await broadcaster.deliver({channelID: [{'content': message} for message in messages] for channelID, messages in channelMessages.items()})
+        if not len(report.errors) == 0:
+            print(f'Error posting results: {report.toString()}')
+
+    # Fetches data again that was served stale during a toornament outage
+    @tasks.loop(seconds = 30)
+    async def revalidateStaleData():
+        try:
+            await runToornament(toornament.revalidate)
+        except Exception as e:
+            print(f'Error revalidating stale data: {e}')
+
+    # Reloads the teams and stages files if they were edited and reports rejected rows and refused reloads in the admin channels
+    @tasks.loop(seconds = 5)
+    async def reloadDataFiles():
+        try:
+            rejectedRows = await runToornament(toornament.reloadChangedFiles)
+        except Exception as e:
+            print(f'Error reloading data files: {e}')
+            return
+
+        if rejectedRows == []:
+            return
+
+        # Splits the rejected rows into messages that fit into the Discord limit
+        messages = []
+        msg = ''
+        for rejectedRow in rejectedRows:
+            line = rejectedRow[:1990] + '\n'
+            if len(msg) + len(line) > 2000:
+                messages += [{'content': msg}]
+                msg = ''
+            msg += line
+        messages += [{'content': msg}]
+
+        report = await broadcaster.broadcast(adminChannels.get('admin'), messages)
+        if not len(report.errors) == 0:
+            print(f'Error posting rejected rows: {report.toString()}')
+
+    @bot.event
+    async def on_ready():
+        if not postResults.is_running():
+            postResults.start()
+        if not revalidateStaleData.is_running():
+            revalidateStaleData.start()
+        if not reloadDataFiles.is_running():
+            reloadDataFiles.start()
+        if overlayServer is not None and overlayServer.runner is None:
+            try:
+                port = await overlayServer.start()
+                print(f'Serving overlay data on {overlayServer.host}:{port}')
+            except OSError as e:
+                print(f'Error starting overlay server: {e}')
+
     #### COMMANDS ####
 
     # Simple ping command to see if bot is running
@@ -84,21 +232,188 @@ def main():
 
     # Update command to post ranking and upcoming fixtures for one specific stage group in channel
     @bot.command()
-    async def update(ctx, week, stageName):
+    async def update(ctx, weekOrStage, stageName = None):
         if checkPerms(ctx):
-            await ctx.send(embed = generateEmbed(week, stageName))
-            await ctx.send(embed = generateToornamentEmbed())
-            await ctx.message.delete()
+            week, stageName = splitWeekArgs(weekOrStage, stageName)
+            if await queuePost(ctx, week, stageName):
+                await ctx.message.delete()
 
     # Update command to post ranking and upcoming fixtures for all stage groups given
     @bot.command()
-    async def updateall(ctx, week, stageNames):
+    async def updateall(ctx, weekOrStages, stageNames = None):
         if checkPerms(ctx):
-            stageNameList = re.split(';', stageNames)
-            for stageName in stageNameList:
-                await ctx.send(embed = generateEmbed(week, stageName))
-            await ctx.send(embed = generateToornamentEmbed())
-            await ctx.message.delete()
+            week, stageNames = splitWeekArgs(weekOrStages, stageNames)
+            if await queuePost(ctx, week, stageNames):
+                await ctx.message.delete()
+
+    # Command to post ranking and upcoming fixtures of the given stage groups to all their broadcast targets
+    # Fetches and renders every stage once and reports which channels received the posts
+    @bot.command()
+    async def broadcast(ctx, weekOrStages, stageNames = None):
+        if checkPerms(ctx):
+            week, stageNames = splitWeekArgs(weekOrStages, stageNames)
+            stages = getStages(stageNames)
+
+            async def postBroadcast():
+                weekInfos = await runToornament(toornament.getWeekInfos, stages, week)
+
+                channelMessages = {}
+                for stage, weekInfo in zip(stages, weekInfos):
+                    embed = generateEmbed(stage, weekInfo)
+                    for channelID in broadcastTargets.get(stage.name):
+                        channelMessages.setdefault(channelID, []).append({'embed': embed})
+
+                if len(channelMessages) == 0:
+                    return None
+
+                toornamentEmbed = generateToornamentEmbed()
+                for messages in channelMessages.values():
+                    messages += [{'embed': toornamentEmbed}]
+
+                return await broadcaster.deliver(channelMessages)
+
+            # Broadcasts go to the same targets no matter where they were started, so they are merged across channels
+            key = ('broadcast', tuple(stage.name for stage in stages), week)
+            success, report = await submitWork(ctx, key, WorkQueue.LOW, postBroadcast)
+
+            if success and report is None:
+                await ctx.send(f'No broadcast targets for {stageNames}.')
+            elif success:
+                await ctx.send(report.toString())
+
+    # Command to post playoff and relegation odds of all teams of a stage by simulating the remaining matches
+    @bot.command()
+    async def odds(ctx, stageName, playoffSpots, relegationSpots = 0, simulations = 100000):
+        if checkPerms(ctx):
+            stage = toornament.getStage(stageName)
+            playoffSpots = int(playoffSpots)
+            relegationSpots = int(relegationSpots)
+            simulations = min(int(simulations), 1000000)
+
+            async def postOdds():
+                ranking = await runToornament(toornament.getRanking, stage)
+                matches = await runToornament(toornament.getStageMatches, stage)
+                simulation = SeasonSimulation(ranking, matches)
+                processes = simulation.getSuggestedProcesses(simulations)
+
+                # Runs the simulation outside of the event loop so the bot keeps responding
+                result = await bot.loop.run_in_executor(None, simulation.run, simulations, processes)
+
+                text = '```' + result.getOddsText(playoffSpots, relegationSpots) + '```'
+                await ctx.send(f'**{stage.name}** odds after {simulations} simulations of {simulation.getRemainingMatchCount()} remaining matches\n' + text)
+
+            key = ('odds', stage.name, playoffSpots, relegationSpots, simulations, ctx.channel.id)
+            await submitWork(ctx, key, WorkQueue.LOW, postOdds)
+
+    # Command to post the queue depth and wait times of the work queue
+    @bot.command()
+    async def queue(ctx):
+        if checkPerms(ctx):
+            await ctx.send(workQueue.getMetricsText())
+
+    # Command to add a channel to the broadcast targets of a stage, uses the current channel if no ID is given
+    @bot.command()
+    async def addtarget(ctx, stageName, channelID = None):
+        if checkPerms(ctx):
+            stage = toornament.getStage(stageName)
+            channelID = ctx.channel.id if channelID is None else int(channelID)
+
+            if stage is not None and broadcastTargets.add(stage.name, channelID):
+                await ctx.send(f'Added broadcast target {channelID} for {stageName}!')
+            else:
+                await ctx.send(f"Couldn't add broadcast target {channelID} for {stageName}.")
+
+    # Command to remove a channel from the broadcast targets of a stage, uses the current channel if no ID is given
+    @bot.command()
+    async def removetarget(ctx, stageName, channelID = None):
+        if checkPerms(ctx):
+            stage = toornament.getStage(stageName)
+            channelID = ctx.channel.id if channelID is None else int(channelID)
+
+            if stage is not None and broadcastTargets.remove(stage.name, channelID):
+                await ctx.send(f'Removed broadcast target {channelID} for {stageName}!')
+            else:
+                await ctx.send(f"Couldn't remove broadcast target {channelID} for {stageName}.")
+
+    # Command to toggle whether the current channel is told about rejected rows of edited data files
+    @bot.command()
+    async def adminchannel(ctx):
+        if checkPerms(ctx):
+            if ctx.channel.id in adminChannels.get('admin'):
+                success = adminChannels.remove('admin', ctx.channel.id)
+                action = 'Stopped posting'
+            else:
+                success = adminChannels.add('admin', ctx.channel.id)
+                action = 'Posting'
+
+            if success:
+                await ctx.send(f'{action} data file problems in this channel!')
+            else:
+                await ctx.send("Couldn't change the admin channels.")
+
+    # Command to apply edited teams or stages files that weren't reloaded because they have much fewer entries
+    @bot.command()
+    async def confirmreload(ctx):
+        if checkPerms(ctx):
+            fileNames, rejectedRows = await runToornament(toornament.confirmReloads)
+
+            if fileNames == []:
+                await ctx.send('No refused reloads to confirm.')
+            else:
+                # The rejected rows were already posted when the reload was refused
+                rejectedText = '' if rejectedRows == [] else f' {len(rejectedRows)} rows were rejected.'
+                await ctx.send(f'Reloaded {", ".join(fileNames)}!' + rejectedText)
+
+    # Command to post the standings of a stage as they were after the given week
+    @bot.command()
+    async def history(ctx, week, stageName):
+        if checkPerms(ctx):
+            stage = toornament.getStage(stageName)
+            ranking = await runToornament(toornament.getHistoricRanking, stage, int(week))
+
+            if ranking is None:
+                await ctx.send(f'No standings recorded for {stageName} until week {week}.')
+            else:
+                weekText = 'before week 1' if ranking.week == 0 else f'after week {ranking.week}'
+                await ctx.send(f'**{stage.name}** {weekText}\n```' + ranking.getRankingText() + '```')
+
+    # Command to post the rank of a team in every recorded week of a stage
+    @bot.command()
+    async def rankhistory(ctx, stageName, teamName):
+        if checkPerms(ctx):
+            stage = toornament.getStage(stageName)
+
+            # Only shows the last recorded rank of every week
+            weekRanks = {}
+            for timestamp, week, rank in await runToornament(toornament.getRankHistory, stage, teamName):
+                weekRanks[week] = rank
+
+            if len(weekRanks) == 0:
+                await ctx.send(f'No standings recorded for {teamName} in {stageName}.')
+            else:
+                await ctx.send(f'{teamName}: ' + ', '.join(('Start' if week == 0 else f'Week {week}') + f' #{rank}' for week, rank in sorted(weekRanks.items())))
+
+    # Command to subscribe the channel to live results of a stage
+    @bot.command()
+    async def feed(ctx, stageName):
+        if checkPerms(ctx):
+            success = resultFeed.addChannel(stageName, ctx.channel.id)
+
+            if success:
+                await ctx.send(f'Posting results of {stageName} in this channel!')
+            else:
+                await ctx.send(f"Couldn't subscribe to results of {stageName}.")
+
+    # Command to unsubscribe the channel from live results of a stage
+    @bot.command()
+    async def unfeed(ctx, stageName):
+        if checkPerms(ctx):
+            success = resultFeed.removeChannel(stageName, ctx.channel.id)
+
+            if success:
+                await ctx.send(f'Stopped posting results of {stageName} in this channel!')
+            else:
+                await ctx.send(f"Couldn't unsubscribe from results of {stageName}.")
 
     # Command to add a new team to the database
     @bot.command()
@@ -107,7 +422,7 @@ def main():
             if emoteID.startswith('\\'):
                 emoteID = emoteID[1:]
 
-            success = toornament.addTeam(teamName, emoteID, nickname)
+            success = await runToornament(toornament.addTeam, teamName, emoteID, nickname)
 
             if success:
                 await ctx.send(f'Added team {teamName}!')
@@ -118,7 +433,7 @@ def main():
     @bot.command()
     async def removeteam(ctx, teamName):
         if checkPerms(ctx):
-            success = toornament.removeTeam(teamName)
+            success = await runToornament(toornament.removeTeam, teamName)
 
             if success:
                 await ctx.send(f'Deleted team {teamName}!')
@@ -129,7 +444,7 @@ def main():
     @bot.command()
     async def addstage(ctx, fullName, stageID, groupID, logoURL, colour, alias = ''):
         if checkPerms(ctx):
-            success = toornament.addStage(fullName, stageID, groupID, logoURL, colour, alias)
+            success = await runToornament(toornament.addStage, fullName, stageID, groupID, logoURL, colour, alias)
 
             if success:
                 await ctx.send(f'Added stage {fullName}!')
@@ -140,7 +455,7 @@ def main():
     @bot.command()
     async def removestage(ctx, stageName):
         if checkPerms(ctx):
-            success = toornament.removeStage(stageName)
+            success = await runToornament(toornament.removeStage, stageName)
 
             if success:
                 await ctx.send(f'Deleted stage {stageName}!')
@@ -151,7 +466,7 @@ def main():
     @bot.command()
     async def table(ctx, stageName, tableStr):
         if checkPerms(ctx):
-            success = toornament.reportStandings(stageName, tableStr)
+            success = await runToornament(toornament.reportStandings, stageName, tableStr)
 
             if success:
                 await ctx.send(f'Reported standings for {stageName}!')
@@ -162,7 +477,7 @@ def main():
     @bot.command()
     async def matches(ctx, weekNumber, stageName, matchesStr):
         if checkPerms(ctx):
-            success = toornament.reportFixtures(stageName, weekNumber, matchesStr)
+            success = await runToornament(toornament.reportFixtures, stageName, weekNumber, matchesStr)
 
             if success:
                 await ctx.send(f'Reported fixtures for {stageName} (Week {weekNumber})!')
@@ -173,4 +488,6 @@ def main():
     print('Starting bot...')
     bot.run(discordToken)
 
-main()
+# Worker processes of the odds simulation import this module again, they must not start a second bot
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+import json
+import gzip
+import time
+import hashlib
+from aiohttp import web
+
+
+# Raised if a response has to be rendered while the toornament data is being changed
+class OverlayBusyError(Exception):
+    pass
+
+
+# Returns whether an Accept-Encoding header allows gzip, codings with q=0 are refused
+def acceptsGzip(acceptEncoding):
+    qualities = {}
+    for part in acceptEncoding.split(','):
+        coding, *parameters = [item.strip() for item in part.split(';')]
+        quality = 1.0
+        for parameter in parameters:
+            name, separator, value = parameter.partition('=')
+            if separator and name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+# Returns whether an If-None-Match header matches the ETag, using the weak comparison HTTP requires for GET and HEAD
+def matchesETag(ifNoneMatch, etag):
+    tags = [tag.strip() for tag in ifNoneMatch.split(',')]
+    return '*' in tags or any(tag.removeprefix('W/') == etag.removeprefix('W/') for tag in tags)
+
+
+# Read-only HTTP API for stream overlays and websites, serves standings and fixtures as JSON
+# Only uses data the bot already has, requests never cause calls to the toornament API
+# Runs on the event loop of the bot, so responses are rendered at most once per cacheTime seconds to keep handlers short
+# Worker threads change the toornament data while holding the lock, responses are only rendered if it is free
+#
+# Routes:
+#   /stages                          all stages
+#   /stages/<stage>                  one stage by name, alias or ID
+#   /stages/<stage>/ranking          current standings
+#   /stages/<stage>/matches          fixtures of the current week
+#   /stages/<stage>/weeks/<week>     fixtures of the given week
+class OverlayServer:
+
+    def __init__(self, toornament, host = '127.0.0.1', port = 8080, cacheTime = 1.0, keepAliveTimeout = 15.0, maxResponses = 1000, lock = None):
+        self.toornament = toornament
+        self.lock = lock
+        self.host = host
+        self.port = port
+        self.cacheTime = cacheTime
+        self.keepAliveTimeout = keepAliveTimeout
+
+        self.runner = None
+        self.requestCount = 0
+
+        # Rendered responses by path: expiry time, body, gzipped body and ETag
+        self.responses = {}
+        self.maxResponses = maxResponses
+
+    # Starts listening, needs to be called from within the event loop
+    # Returns the port the server listens on, which is chosen by the system if port 0 was given
+    async def start(self):
+        if self.runner is None:
+            app = web.Application()
+            app.router.add_get('/{path:.*}', self.handleRequest)
+
+            # Access logs are disabled, every overlay refresh would be logged otherwise
+            runner = web.AppRunner(app, access_log = None, keepalive_timeout = self.keepAliveTimeout)
+            await runner.setup()
+            try:
+                await web.TCPSite(runner, self.host, self.port).start()
+            except:
+                await runner.cleanup()
+                raise
+
+            self.runner = runner
+            self.port = runner.addresses[0][1]
+
+        return self.port
+
+    # Stops listening and closes open connections
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    # Answers a GET or HEAD request, aiohttp leaves out the body of HEAD responses and answers other methods with 405
+    async def handleRequest(self, request):
+        self.requestCount += 1
+        headers = {'Access-Control-Allow-Origin': '*'}
+
+        try:
+            response = self.getResponse(request.path)
+        except OverlayBusyError:
+            headers['Retry-After'] = '1'
+            return web.Response(status = 503, headers = headers)
+
+        if response is None:
+            return web.json_response({'error': 'not found'}, status = 404, headers = headers)
+
+        expiry, body, gzipBody, etag = response
+        headers['ETag'] = etag
+        headers['Cache-Control'] = f'max-age={int(self.cacheTime)}'
+        headers['Vary'] = 'Accept-Encoding'
+
+        if matchesETag(request.headers.get('If-None-Match', ''), etag):
+            return web.Response(status = 304, headers = headers)
+
+        if acceptsGzip(request.headers.get('Accept-Encoding', '')):
+            body = gzipBody
+            headers['Content-Encoding'] = 'gzip'
+
+        return web.Response(body = body, content_type = 'application/json', headers = headers)
+
+    # Returns the rendered response of a path, renders it again if it's older than cacheTime
+    # Keeps serving the old response while the data is being changed, raises OverlayBusyError if there is none
+    # Returns None if the path doesn't exist
+    def getResponse(self, path):
+        path = '/' + '/'.join(part for part in path.split('/') if not part == '')
+        now = time.monotonic()
+        response = self.responses.get(path)
+        if response is not None and response[0] > now:
+            return response
+
+        # Never waits for the lock, it can be held during API calls and would block the event loop
+        if self.lock is not None and not self.lock.acquire(blocking = False):
+            if response is None:
+                raise OverlayBusyError(f'Data of {path} is being updated')
+            return response
+
+        try:
+            data = self.getData(path)
+        finally:
+            if self.lock is not None:
+                self.lock.release()
+
+        if data is None:
+            self.responses.pop(path, None)
+            return None
+
+        body = json.dumps(data, separators = (',', ':')).encode('utf-8')
+
+        # Keeps the ETag of unchanged data, so clients only download it again after it actually changed
+        if response is not None and response[1] == body:
+            response = (now + self.cacheTime, response[1], response[2], response[3])
+        else:
+            etag = 'W/"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+            response = (now + self.cacheTime, body, gzip.compress(body, compresslevel = 6), etag)
+
+        # Forgets expired responses if many different paths were requested
+        if len(self.responses) >= self.maxResponses:
+            self.responses = {cachedPath: cachedResponse for cachedPath, cachedResponse in self.responses.items() if cachedResponse[0] > now}
+
+        self.responses[path] = response
+        return response
+
+    # Returns the JSON data of a path or None if it doesn't exist
+    def getData(self, path):
+        parts = [part for part in path.split('/') if not part == '']
+        if parts == ['stages']:
+            return [self.getStageJSON(stage) for stage in self.toornament.stages]
+
+        if len(parts) < 2 or not parts[0] == 'stages':
+            return None
+
+        stage = self.toornament.getStage(parts[1])
+        if stage is None:
+            return None
+
+        if len(parts) == 2:
+            return self.getStageJSON(stage)
+        elif parts[2:] == ['ranking']:
+            return self.getRankingJSON(self.toornament.getCachedWeekInfo(stage))
+        elif parts[2:] == ['matches']:
+            return self.getWeekJSON(self.toornament.getCachedWeekInfo(stage))
+        elif len(parts) == 4 and parts[2] == 'weeks' and self.toornament.isInt(parts[3]) and int(parts[3]) > 0:
+            return self.getWeekJSON(self.toornament.getCachedWeekInfo(stage, int(parts[3])))
+
+        return None
+
+    # Returns the metadata of a stage as JSON data
+    def getStageJSON(self, stage):
+        return {
+            'name': stage.name,
+            'alias': stage.alias,
+            'id': stage.id,
+            'groupID': stage.groupID,
+            'logoURL': stage.logoURL,
+            'colour': stage.colourStr
+        }
+
+    # Returns the standings of a week as JSON data
+    def getRankingJSON(self, week):
+        return {
+            'stage': week.standings.stage.name,
+            'week': week.number,
+            'stale': week.standings.stale,
+            'fetchTime': None if week.standings.fetchTime is None else week.standings.fetchTime.isoformat(),
+            'teams': [{
+                'name': team.name,
+                'emote': team.emote,
+                'position': team.position,
+                'rank': team.rank,
+                'points': team.points,
+                'wins': team.wins,
+                'losses': team.losses,
+                'played': team.played,
+                'forfeits': team.forfeits,
+                'gamesWon': team.gamesWon,
+                'gamesLost': team.gamesLost,
+                'gameDifference': team.gameDifference
+            } for team in week.standings.teams]
+        }
+
+    # Returns the fixtures of a week as JSON data, scores are null for unplayed matches
+    def getWeekJSON(self, week):
+        return {
+            'stage': week.standings.stage.name,
+            'week': week.number,
+            'stale': week.stale,
+            'fetchTime': None if week.fetchTime is None else week.fetchTime.isoformat(),
+            'matches': [{
+                'number': match.number,
+                'homeTeam': match.homeTeamName,
+                'homeEmote': match.homeTeamEmote,
+                'homeScore': None if match.pending else match.homeScore,
+                'homeForfeit': match.homeForfeit,
+                'awayTeam': match.awayTeamName,
+                'awayEmote': match.awayTeamEmote,
+                'awayScore': None if match.pending else match.awayScore,
+                'awayForfeit': match.awayForfeit,
+                'pending': match.pending
+            } for match in sorted(week.matches, key = lambda match: match.number)]
+        }
@@ -0,0 +1,174 @@
+import os
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Bytes needed per simulated game of a chunk: random floats, game wins, both cumulative scores and the series end checks
+BYTES_PER_GAME = 16
+
+
+# Simulates the given number of seasons and returns how often every team finished on every position
+# Runs as a top-level function so it can be sent to worker processes
+# Every remaining match is played game by game until one team reached winsNeeded games
+# Seasons are simulated in chunks that fit into memoryBudget bytes
+def simulatePositions(arrays, simulations, seed, memoryBudget = 64 * 1024 * 1024):
+    rng = np.random.default_rng(seed)
+    teamCount = len(arrays['points'])
+    positionCounts = np.zeros((teamCount, teamCount), dtype = np.int64)
+
+    home = arrays['home']
+    away = arrays['away']
+    winsNeeded = arrays['winsNeeded']
+    maxGames = 2 * winsNeeded - 1
+    chunkSize = max(1, memoryBudget // (max(1, len(home)) * maxGames * BYTES_PER_GAME))
+
+    for chunkStart in range(0, simulations, chunkSize):
+        count = min(chunkSize, simulations - chunkStart)
+
+        # Plays the longest possible series and cuts it off once one team reached the needed wins
+        homeGameWins = rng.random((count, len(home), maxGames)) < arrays['gameProbabilities'][None, :, None]
+        homeCumulative = np.cumsum(homeGameWins, axis = 2, dtype = np.int16)
+        awayCumulative = np.arange(1, maxGames + 1, dtype = np.int16)[None, None, :] - homeCumulative
+        seriesEnd = np.argmax((homeCumulative == winsNeeded) | (awayCumulative == winsNeeded), axis = 2)[:, :, None]
+        homeScores = np.take_along_axis(homeCumulative, seriesEnd, axis = 2)[:, :, 0]
+        awayScores = np.take_along_axis(awayCumulative, seriesEnd, axis = 2)[:, :, 0]
+        homeWins = homeScores > awayScores
+
+        # Adds the simulated results to the current standings
+        wins = np.tile(arrays['wins'], (count, 1))
+        gamesWon = np.tile(arrays['gamesWon'], (count, 1))
+        gamesLost = np.tile(arrays['gamesLost'], (count, 1))
+        for matchIndex in range(len(home)):
+            homeTeam = home[matchIndex]
+            awayTeam = away[matchIndex]
+            wins[:, homeTeam] += homeWins[:, matchIndex]
+            wins[:, awayTeam] += ~homeWins[:, matchIndex]
+            gamesWon[:, homeTeam] += homeScores[:, matchIndex]
+            gamesWon[:, awayTeam] += awayScores[:, matchIndex]
+            gamesLost[:, homeTeam] += awayScores[:, matchIndex]
+            gamesLost[:, awayTeam] += homeScores[:, matchIndex]
+
+        points = arrays['points'][None, :] + (wins - arrays['wins'][None, :]) * arrays['pointsPerWin']
+        gameDifference = gamesWon - gamesLost
+
+        # Ranks by points, wins, game difference and games won, remaining ties are broken randomly
+        order = np.lexsort((rng.random((count, teamCount)), -gamesWon, -gameDifference, -wins, -points), axis = -1)
+        for position in range(teamCount):
+            positionCounts[:, position] += np.bincount(order[:, position], minlength = teamCount)
+
+    return positionCounts
+
+
+# Monte Carlo simulation of the rest of a season based on the current standings and the remaining fixtures
+class SeasonSimulation:
+
+    def __init__(self, ranking, matches, pointsPerWin = None, winsNeeded = None):
+        self.teamNames = [team.name for team in ranking.teams]
+        teamIndexes = {teamName: index for index, teamName in enumerate(self.teamNames)}
+
+        # Only matches between teams of the ranking can be simulated
+        remainingMatches = [match for match in matches if match.pending and match.homeTeamName in teamIndexes and match.awayTeamName in teamIndexes]
+
+        wins = np.array([int(team.wins) for team in ranking.teams], dtype = np.int64)
+        points = np.array([int(team.points) for team in ranking.teams], dtype = np.int64)
+        gamesWon = np.array([int(team.gamesWon) for team in ranking.teams], dtype = np.int64)
+        gamesLost = np.array([int(team.gamesLost) for team in ranking.teams], dtype = np.int64)
+
+        # Derives the points for a win from the standings if they aren't given
+        if pointsPerWin is None:
+            pointsPerWin = 1
+            if wins.sum() > 0 and points.sum() > 0:
+                pointsPerWin = max(1, int(round(points.sum() / wins.sum())))
+
+        # Derives the series length from the most common winning score of the played matches, e.g. 3 for best of five
+        if winsNeeded is None:
+            winnerScores = [max(match.homeScore, match.awayScore) for match in matches
+                if not match.pending and isinstance(match.homeScore, int) and isinstance(match.awayScore, int)]
+            winsNeeded = max(set(winnerScores), key = winnerScores.count) if not winnerScores == [] else 1
+            winsNeeded = min(max(1, winsNeeded), 7)
+
+        # Chance of the home team to win a single game, from the share of games every team won so far
+        gameShares = (gamesWon + 1) / (gamesWon + gamesLost + 2)
+        home = np.array([teamIndexes[match.homeTeamName] for match in remainingMatches], dtype = np.int64)
+        away = np.array([teamIndexes[match.awayTeamName] for match in remainingMatches], dtype = np.int64)
+        homeShares = gameShares[home]
+        awayShares = gameShares[away]
+        gameProbabilities = homeShares * (1 - awayShares) / (homeShares * (1 - awayShares) + awayShares * (1 - homeShares))
+
+        self.arrays = {
+            'points': points,
+            'wins': wins,
+            'gamesWon': gamesWon,
+            'gamesLost': gamesLost,
+            'home': home,
+            'away': away,
+            'gameProbabilities': gameProbabilities,
+            'pointsPerWin': pointsPerWin,
+            'winsNeeded': winsNeeded
+        }
+
+    # Returns the number of matches left to simulate
+    def getRemainingMatchCount(self):
+        return len(self.arrays['home'])
+
+    # Returns how many processes are worth using, small leagues are simulated faster without starting a process pool
+    def getSuggestedProcesses(self, simulations):
+        workload = simulations * self.getRemainingMatchCount() * self.arrays['winsNeeded']
+        if workload < 50000000:
+            return 1
+        return min(4, os.cpu_count() or 1)
+
+    # Simulates the rest of the season the given number of times, optionally split over several processes
+    def run(self, simulations = 100000, processes = 1, seed = None):
+        seeds = np.random.SeedSequence(seed).spawn(max(1, processes))
+
+        if processes <= 1:
+            positionCounts = simulatePositions(self.arrays, simulations, seeds[0])
+        else:
+            counts = [simulations // processes + (1 if index < simulations % processes else 0) for index in range(processes)]
+            # Workers are always spawned, forking the bot would copy its event loop and the locks held by other threads
+            # Spawned workers import the main module again, so the bot may only be started behind a __main__ check
+            with ProcessPoolExecutor(max_workers = processes, mp_context = multiprocessing.get_context('spawn')) as executor:
+                positionCounts = sum(executor.map(simulatePositions, [self.arrays] * processes, counts, seeds))
+
+        return SimulationResult(self.teamNames, positionCounts, simulations)
+
+
+# Finishing positions of all teams over all simulated seasons
+class SimulationResult:
+
+    def __init__(self, teamNames, positionCounts, simulations):
+        self.teamNames = teamNames
+        self.positionCounts = positionCounts
+        self.simulations = simulations
+
+    # Returns the chance of every team to finish within the top spots
+    def getPlayoffOdds(self, spots):
+        return self.positionCounts[:, :spots].sum(axis = 1) / self.simulations
+
+    # Returns the chance of every team to finish within the bottom spots
+    def getRelegationOdds(self, spots):
+        if spots <= 0:
+            return np.zeros(len(self.teamNames))
+        return self.positionCounts[:, -spots:].sum(axis = 1) / self.simulations
+
+    # Generates a table of playoff and relegation odds out of text and returns it
+    def getOddsText(self, playoffSpots, relegationSpots = 0):
+        playoffOdds = self.getPlayoffOdds(playoffSpots)
+        relegationOdds = self.getRelegationOdds(relegationSpots)
+        namePadding = max([len('Team')] + [len(teamName) for teamName in self.teamNames])
+
+        header = 'Team'.ljust(namePadding) + ' | Playoffs'
+        if relegationSpots > 0:
+            header += ' | Releg.'
+        msg = header + '\n' + '-' * (namePadding + 1) + '+' + '-' * 10 + ('+' + '-' * 8 if relegationSpots > 0 else '') + '\n'
+
+        # Lists teams by their playoff chances
+        for index in sorted(range(len(self.teamNames)), key = lambda index: (-playoffOdds[index], relegationOdds[index])):
+            line = self.teamNames[index].ljust(namePadding) + f' | {playoffOdds[index] * 100:7.1f}%'
+            if relegationSpots > 0:
+                line += f' | {relegationOdds[index] * 100:5.1f}%'
+            msg += line + '\n'
+
+        return msg
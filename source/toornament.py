@@ -5,8 +5,15 @@ import re
 import datetime
 import math
 import io
+import os
+import copy
+import struct
+import zlib
 from time import sleep
 from discord import Colour
+from history import SnapshotLog
+from circuit import CircuitBreaker
+from watcher import FileWatcher
 
 class Toornament:
 
@@ -35,60 +42,55 @@ class Toornament:
             sys.exit('Invalid toornament API token file or data')
 
         # Loads team emote info
-        try:
-            teamsFile = io.open(self.baseFolder + teamsFile, 'r', encoding = 'utf-8')
-            teamInfos = [line.rstrip('\n') for line in teamsFile]
-            self.teamInfos = []
-
-            for teamInfo in teamInfos:
-                splitInfo = re.split(';', teamInfo)
-                teamName = splitInfo[0].strip()
-                teamEmote = splitInfo[1].strip()
-
-                nextTeamInfo = TeamInfo()
-                nextTeamInfo.name = teamName
-                nextTeamInfo.emote = teamEmote
-                
-                if len(splitInfo) > 2:
-                    nextTeamInfo.nickname = splitInfo[2].strip()
-
-                self.teamInfos += [nextTeamInfo]
-
-            teamsFile.close()
-        except:
+        self.teamInfos, rejectedRows = self.readTeamsFile()
+        if self.teamInfos is None:
             print('Could not read teams file')
             sys.exit('Invalid team file or data')
 
+        for rejectedRow in rejectedRows:
+            print(rejectedRow)
+
         # Loads list of available stages and settings for those
-        try:
-            stagesFile = io.open(self.baseFolder + stagesFile, 'r', encoding = 'utf-8')
-            stageInfos = [line.rstrip('\n') for line in stagesFile]
-            self.stages = []
-
-            for stageInfo in stageInfos:
-                splitInfo = re.split(';', stageInfo)
-                stageName = splitInfo[0].strip()
-                stageID = splitInfo[1].strip()
-                stageGroupID = splitInfo[2].strip()
-                stageLogo = splitInfo[3].strip()
-                stageColour = splitInfo[4].strip()
-                stageAlias = ''
-                if len(splitInfo) > 5:
-                    stageAlias = splitInfo[5].strip()
-
-                stage = Stage(name = stageName, id = stageID, groupID = stageGroupID, logoURL = stageLogo, colour = stageColour, alias = stageAlias)
-
-                self.stages += [stage]
-            
-            stagesFile.close()
-        except:
+        self.stages, rejectedRows = self.readStagesFile()
+        if self.stages is None:
             print('Could not read stages info file')
             sys.exit('Invalid stages data')
 
+        for rejectedRow in rejectedRows:
+            print(rejectedRow)
+
+        # Notices when the teams or stages file is edited outside of the bot
+        self.fileWatcher = FileWatcher([self.baseFolder + self.teamsFile, self.baseFolder + self.stagesFile])
+
+        # Paths of edited files that weren't reloaded because they looked truncated, until an admin confirms them
+        self.refusedReloads = set()
+
         # These headers need to be supplied with every API call for authorization
         self.headers = {'X-Api-Key': self.token}
         self.lastCall = datetime.datetime.now()
 
+        # Keeps the HTTP connection alive between calls
+        self.session = requests.Session()
+
+        # Stops calling the API while it is down, stale data is served instead until it is revalidated
+        self.circuit = CircuitBreaker()
+        self.requestTimeout = 10
+        self.lastRankings = {}
+        self.staleStages = {}
+
+        # Whole-stage fixture indexes, keyed by stage and group ID
+        self.fixtureIndexes = {}
+
+        # Time after which unfinished rounds are refetched and after which the whole stage is refetched
+        self.fixtureRefreshTime = datetime.timedelta(minutes = 1)
+        self.fixtureFullRefreshTime = datetime.timedelta(hours = 6)
+
+        # Number of rounds with results the result feed keeps refreshing to notice score corrections
+        self.feedCorrectionRounds = 2
+
+        # Append-only history of all ranking and match snapshots
+        self.history = SnapshotLog(self.baseFolder + 'history/')
+
 
     # Waits until a certain cooldown since the last API call has passed to avoid overloading the endpoint
     def cooldownAPI(self):
@@ -104,6 +106,241 @@ class Toornament:
 
         self.lastCall = datetime.datetime.now()
 
+    # Requests every item of a paginated API collection, one page per call
+    # Returns None in case of API error or immediately if the circuit breaker is open
+    def getAllItems(self, requestURL, rangeUnit, pageSize = 50):
+        items = []
+        start = 0
+
+        while True:
+            if not self.circuit.allowRequest():
+                return None
+
+            self.cooldownAPI()
+
+            # Copies headers so the range of one call doesn't leak into others
+            headers = dict(self.headers)
+            headers['Range'] = f'{rangeUnit}={start}-{start + pageSize - 1}'
+
+            try:
+                response = self.session.get(url = requestURL, headers = headers, timeout = self.requestTimeout)
+            except requests.RequestException:
+                self.circuit.recordFailure()
+                return None
+
+            # Only outages and rate limiting count as failures, other errors are caused by the request itself
+            if response.status_code >= 500 or response.status_code == 429:
+                self.circuit.recordFailure()
+                return None
+
+            self.circuit.recordSuccess()
+            if not response.status_code == 206:
+                return None
+
+            page = response.json()
+            items += page
+            start += pageSize
+
+            # Content-Range has the form "<unit> <first>-<last>/<total>"
+            totalCount = None
+            contentRange = response.headers.get('Content-Range', '')
+            if '/' in contentRange and self.isInt(contentRange.split('/')[-1]):
+                totalCount = int(contentRange.split('/')[-1])
+
+            if len(page) < pageSize or (totalCount is not None and start >= totalCount):
+                return items
+
+    # Reads all team infos from the teams file
+    # Returns None instead of the team infos if the file can't be read and a message for every invalid row
+    def readTeamsFile(self):
+        teamInfos = []
+        rejectedRows = []
+
+        try:
+            teamsFile = io.open(self.baseFolder + self.teamsFile, 'r', encoding = 'utf-8')
+            lines = [line.rstrip('\n') for line in teamsFile]
+            teamsFile.close()
+        except OSError:
+            return None, [f'Could not read {self.teamsFile}']
+
+        for lineNumber, line in enumerate(lines, start = 1):
+            if line.strip() == '':
+                continue
+
+            splitInfo = re.split(';', line)
+            if len(splitInfo) < 2 or splitInfo[0].strip() == '':
+                rejectedRows += [f'{self.teamsFile} line {lineNumber} rejected, expected name;emote;nickname: {line}']
+                continue
+
+            nextTeamInfo = TeamInfo()
+            nextTeamInfo.name = splitInfo[0].strip()
+            nextTeamInfo.emote = splitInfo[1].strip()
+            
+            if len(splitInfo) > 2:
+                nextTeamInfo.nickname = splitInfo[2].strip()
+
+            teamInfos += [nextTeamInfo]
+
+        return teamInfos, rejectedRows
+
+    # Reads all stages from the stages file
+    # Returns None instead of the stages if the file can't be read and a message for every invalid row
+    def readStagesFile(self):
+        stages = []
+        rejectedRows = []
+
+        try:
+            stagesFile = io.open(self.baseFolder + self.stagesFile, 'r', encoding = 'utf-8')
+            lines = [line.rstrip('\n') for line in stagesFile]
+            stagesFile.close()
+        except OSError:
+            return None, [f'Could not read {self.stagesFile}']
+
+        for lineNumber, line in enumerate(lines, start = 1):
+            if line.strip() == '':
+                continue
+
+            splitInfo = re.split(';', line)
+            if len(splitInfo) < 5 or splitInfo[0].strip() == '' or splitInfo[1].strip() == '':
+                rejectedRows += [f'{self.stagesFile} line {lineNumber} rejected, expected name;id;groupID;logoURL;colour;alias: {line}']
+                continue
+
+            stageAlias = ''
+            if len(splitInfo) > 5:
+                stageAlias = splitInfo[5].strip()
+
+            try:
+                stage = Stage(name = splitInfo[0].strip(), id = splitInfo[1].strip(), groupID = splitInfo[2].strip(), logoURL = splitInfo[3].strip(), colour = splitInfo[4].strip(), alias = stageAlias)
+            except ValueError:
+                rejectedRows += [f'{self.stagesFile} line {lineNumber} rejected, invalid colour {splitInfo[4].strip()}: {line}']
+                continue
+
+            stages += [stage]
+
+        return stages, rejectedRows
+
+    # Reloads the teams and stages files if they were changed outside of the bot
+    # Only the changed file is read again, returns messages about rows that were rejected and reloads that were refused
+    def reloadChangedFiles(self):
+        messages = []
+
+        for path in self.fileWatcher.getChangedFiles():
+            messages += self.reloadFile(path)
+
+        return messages
+
+    # Reloads the files whose reload was refused, e.g. after an admin confirmed that entries were removed on purpose
+    # Returns the names of the reloaded files and messages about rows that were rejected
+    def confirmReloads(self):
+        fileNames = []
+        messages = []
+
+        for path in sorted(self.refusedReloads):
+            messages += self.reloadFile(path, force = True)
+            if not path in self.refusedReloads:
+                fileNames += [os.path.basename(path)]
+
+        return fileNames, messages
+
+    # Reads the teams or stages file again and applies it, returns messages about rejected rows and refused reloads
+    # Empty files and files with less than half of the current entries are most likely broken and only applied if forced
+    def reloadFile(self, path, force = False):
+        if path == self.baseFolder + self.teamsFile:
+            fileName, entryName, currentCount = self.teamsFile, 'teams', len(self.teamInfos)
+            entries, messages = self.readTeamsFile()
+            apply = self.applyTeamInfos
+        elif path == self.baseFolder + self.stagesFile:
+            fileName, entryName, currentCount = self.stagesFile, 'stages', len(self.stages)
+            entries, messages = self.readStagesFile()
+            apply = self.applyStages
+        else:
+            return []
+
+        if entries is None:
+            return messages
+
+        if not force and (len(entries) == 0 or len(entries) * 2 < currentCount):
+            self.refusedReloads.add(path)
+            return messages + [f'{fileName} not reloaded, it has {len(entries)} {entryName} instead of {currentCount}. '
+                + 'Fix the file or use the confirmreload command if the entries were removed on purpose.']
+
+        self.refusedReloads.discard(path)
+        apply(entries)
+        return messages
+
+    # Replaces the team infos and updates the names and emotes of cached matches and rankings of changed teams
+    # Cached objects are replaced instead of changed, so data that is being rendered stays consistent
+    def applyTeamInfos(self, teamInfos):
+        oldInfos = {teamInfo.name: teamInfo for teamInfo in self.teamInfos}
+        newInfos = {teamInfo.name: teamInfo for teamInfo in teamInfos}
+
+        # Collects every name under which a changed team may appear in cached data
+        changedNames = set()
+        for teamName in set(oldInfos) | set(newInfos):
+            oldInfo = oldInfos.get(teamName)
+            newInfo = newInfos.get(teamName)
+            if oldInfo is None or newInfo is None or not oldInfo.toCSV() == newInfo.toCSV():
+                for teamInfo in [oldInfo, newInfo]:
+                    if teamInfo is not None:
+                        changedNames.update(name for name in [teamInfo.name, teamInfo.nickname] if not name == '')
+
+        self.teamInfos = teamInfos
+        if len(changedNames) == 0:
+            return
+
+        for index in self.fixtureIndexes.values():
+            affectedMatches = {}
+            for teamName in changedNames:
+                affectedMatches.update(index.teams.get(teamName, {}))
+
+            for match in affectedMatches.values():
+                newMatch = copy.copy(match)
+                newMatch.homeTeamName, newMatch.homeTeamEmote = self.getTeamDisplay(match.homeTeamName, match.homeTeamEmote, changedNames, oldInfos)
+                newMatch.awayTeamName, newMatch.awayTeamEmote = self.getTeamDisplay(match.awayTeamName, match.awayTeamEmote, changedNames, oldInfos)
+                index.add(newMatch)
+
+        for key, ranking in list(self.lastRankings.items()):
+            if any(team.name in changedNames for team in ranking.teams):
+                newRanking = copy.copy(ranking)
+                newRanking.teams = []
+                for team in ranking.teams:
+                    newTeam = copy.copy(team)
+                    newTeam.name, newTeam.emote = self.getTeamDisplay(team.name, team.emote, changedNames, oldInfos)
+                    newRanking.teams += [newTeam]
+                self.lastRankings[key] = newRanking
+
+    # Returns the display name and emote of a team after the team infos changed
+    # Keeps the previous ones if the team didn't change or was removed
+    def getTeamDisplay(self, displayName, emote, changedNames, oldInfos):
+        if not displayName in changedNames:
+            return displayName, emote
+
+        # Looks the team up by its full name, the nickname may have changed
+        teamName = displayName
+        for oldInfo in oldInfos.values():
+            if oldInfo.nickname == displayName:
+                teamName = oldInfo.name
+
+        teamInfo = self.getTeam(teamName)
+        if teamInfo is None:
+            return displayName, emote
+
+        if not teamInfo.nickname == '':
+            return teamInfo.nickname, teamInfo.emote
+        return teamInfo.name, teamInfo.emote
+
+    # Replaces the stages and drops cached data of stages that were removed or point to another stage or group now
+    def applyStages(self, stages):
+        newKeys = set(self.getStageKey(stage) for stage in stages)
+        oldKeys = set(self.getStageKey(stage) for stage in self.stages)
+
+        self.stages = stages
+
+        for key in oldKeys - newKeys:
+            self.fixtureIndexes.pop(key, None)
+            self.lastRankings.pop(key, None)
+            self.staleStages.pop(key, None)
+
     # Returns information on the stage with the given name, alias or id
     def getStage(self, name):
         for stage in self.stages:
@@ -116,6 +353,17 @@ class Toornament:
             if teamInfo.name == name or teamInfo.nickname == name:
                 return teamInfo
                 
+    # Returns the name a team is shown with and its emote, the nickname replaces the name if there is one
+    # Teams that are missing from the teams file, e.g. while it is being edited, are shown with the given name and without emote
+    def getTeamDisplayInfo(self, name):
+        teamInfo = self.getTeam(name)
+        if teamInfo is None:
+            return name, ''
+
+        if not teamInfo.nickname == '':
+            return teamInfo.nickname, teamInfo.emote
+        return teamInfo.name, teamInfo.emote
+
     # Returns the URL of the tournament page of a given stage
     def getStageURL(self, stage):
         stageURL = f'https://www.toornament.com/en_GB/tournaments/{self.tournamentID}/stages/{stage.id}/'
@@ -159,6 +407,8 @@ class Toornament:
                 file.write(teamInfo.toCSV() + '\n')
             
             file.close()
+            self.fileWatcher.update(self.baseFolder + self.teamsFile)
+            self.refusedReloads.discard(self.baseFolder + self.teamsFile)
             return True
         except:
             print('Error writing teams file')
@@ -194,49 +444,129 @@ class Toornament:
     # Saves stage list
     def saveStagesList(self):
         try:
-            file = io.open(self.baseFolder + self.stagesFile, 'w', 'utf-8')
+            file = io.open(self.baseFolder + self.stagesFile, 'w', encoding = 'utf-8')
 
             for stage in self.stages:
                 file.write(stage.toCSV() + '\n')
             
             file.close()
+            self.fileWatcher.update(self.baseFolder + self.stagesFile)
+            self.refusedReloads.discard(self.baseFolder + self.stagesFile)
             return True
         except:
             print('Error writing stages file')
             return False
 
     # Returns the current ranking and upcoming fixtures for the given week
-    def getWeekInfo(self, stage, weekNumber):
+    def getWeekInfo(self, stage, weekNumber = None):
+        return self.getWeekInfos([stage], weekNumber)[0]
+
+    # Returns the current rankings and upcoming fixtures of several stages for the given week
+    # Uses the current week of each stage if no week is given
+    # Fetches the data of all stages with as few API calls as possible
+    def getWeekInfos(self, stages, weekNumber = None):
+
+        rankings = self.getRankings(stages)
+
+        # Fetches and refreshes the fixtures of all stages at once, the weeks below are only read from these indexes
+        # so a stage that couldn't be fetched isn't requested again in the same call
+        indexes = {}
+        if self.enableAPI:
+            indexes = self.getFixtureIndexes(stages, None if weekNumber is None else int(weekNumber))
+
+        weeks = []
+        for stage, ranking in zip(stages, rankings):
+            week = Week()
+            week.standings = ranking
+            index = indexes.get(self.getStageKey(stage))
+            if self.enableAPI:
+                week.number, week.matches = self.getIndexedWeek(stage, index, weekNumber)
+            else:
+                week.number = self.getCurrentWeek(stage) if weekNumber is None else int(weekNumber)
+                week.matches = self.getMatches(stage, week.number)
+            weeks += [week]
+
+            # Marks the week as stale if any of its data couldn't be fetched
+            week.fetchTime = ranking.fetchTime
+            if self.enableAPI:
+                indexStale = index is None or index.stale
+                week.stale = ranking.stale or indexStale
+                if index is not None and (week.fetchTime is None or index.lastSuccess < week.fetchTime):
+                    week.fetchTime = index.lastSuccess
+                if indexStale:
+                    self.staleStages[self.getStageKey(stage)] = stage
+            else:
+                week.stale = ranking.stale
+
+            # Standings are recorded as the standings after the last completed week, not the week that is shown
+            completedWeek = self.getCompletedWeek(stage)
+            if not ranking.stale and completedWeek is not None:
+                self.recordRanking(ranking, completedWeek)
+            if not week.stale:
+                self.recordMatches(stage, week.number, week.matches)
+
+        return weeks
+
+    # Returns the rankings and fixtures of a stage for the given week from cached data only, never calls the API
+    # Uses the current week of the fixture index or the last recorded week if no week is given
+    def getCachedWeekInfo(self, stage, weekNumber = None):
 
         week = Week()
-        week.standings = self.getRanking(stage)
-        week.matches = self.getMatches(stage, weekNumber)
+
+        if not self.enableAPI:
+            week.standings = self.getRanking(stage)
+            week.number = self.getCurrentWeek(stage) if weekNumber is None else int(weekNumber)
+            week.matches = self.getMatches(stage, week.number)
+            week.fetchTime = week.standings.fetchTime
+            return week
+
+        key = self.getStageKey(stage)
+        index = self.fixtureIndexes.get(key)
+
+        # Uses the last fetched ranking or the last recorded one if the stage wasn't fetched since the start
+        ranking = self.lastRankings.get(key)
+        if ranking is None:
+            ranking = self.getHistoricRanking(stage)
+            if ranking is None:
+                ranking = Ranking(stage)
+            ranking.stale = True
+
+        week.number, week.matches = self.getIndexedWeek(stage, index, weekNumber)
+        week.standings = ranking
+        week.stale = ranking.stale or index is None or index.stale or key in self.staleStages
+        week.fetchTime = ranking.fetchTime
+        if index is not None and (week.fetchTime is None or index.lastSuccess < week.fetchTime):
+            week.fetchTime = index.lastSuccess
+
         return week
 
+    # Returns the number and fixtures of a week of a stage from its fixture index, uses the current week if no week is given
+    # Falls back to the last recorded fixtures if the stage wasn't fetched since the start, never calls the API
+    def getIndexedWeek(self, stage, index, weekNumber = None):
+        if weekNumber is not None:
+            number = int(weekNumber)
+        elif index is not None:
+            number = index.getCurrentRound()
+        else:
+            entry = self.history.findByTime(self.getStageKey(stage), SnapshotLog.MATCHES, float('inf'))
+            number = 1 if entry is None else entry[1]
+
+        # Copies matches so rendering can't change the indexed data
+        if index is not None:
+            return number, [copy.copy(match) for match in index.getRound(number)]
+
+        historicMatches = self.getHistoricMatches(stage, number)
+        return number, [] if historicMatches is None else historicMatches
+
     # Returns the ranking information for the given tournament stage
     # Returns empty rankings in case of API error
     def getRanking(self, stage):
 
-        self.cooldownAPI()
-
-        responseJSON = {}
         ranking = Ranking(stage)
 
         # Either reads ranking info from API or existing CSV file
         if self.enableAPI:
-            requestURL = f'https://api.toornament.com/viewer/v2/tournaments/{self.tournamentID}/stages/{stage.id}/ranking-items'
-            if not stage.groupID == '':
-                requestURL += f'?group_ids={stage.groupID}'
-
-            modifiedHeaders = self.headers
-            modifiedHeaders['Range'] = 'items=0-49'
-
-            response = requests.get(url = requestURL, headers = modifiedHeaders)
-
-            if(response.status_code == 206):
-                responseJSON = response.json()
-            else:
-                return ranking
+            return self.getRankings([stage])[0]
         else:
             try:
                 csvFile = open(f'{self.baseFolder}{stage.id}_{stage.groupID}.csv', 'r')
@@ -244,10 +574,7 @@ class Toornament:
                 for csvLine in csvFile:
                     team = Team()
                     team.fromCSV(csvLine)
-                    teamInfo = self.getTeam(team.name)
-                    team.emote = teamInfo.emote
-                    if not teamInfo.nickname == '':
-                        team.name = teamInfo.nickname
+                    team.name, team.emote = self.getTeamDisplayInfo(team.name)
                     ranking.teams += [team]
 
                 csvFile.close()
@@ -255,71 +582,140 @@ class Toornament:
             except:
                 return Ranking(stage)
 
-            # with open(f'{stage.id}_{stage.groupID}.json', 'r') as jsonFile:
-            #     responseJSON = json.load(jsonFile)
-            #     ranking = Ranking(stage)
+    # Returns the rankings of several stages in the same order as the stages
+    # Groups of the same stage share one API call, returns empty rankings in case of API error
+    def getRankings(self, stages):
 
-        # Reads ranking information for every team in response
-        for teamJSON in responseJSON:
-            nextTeam = Team()
+        if not self.enableAPI:
+            return [self.getRanking(stage) for stage in stages]
 
-            teamInfo = self.getTeam(teamJSON['participant']['name'])
-            nextTeam.name = teamInfo.name
-            nextTeam.emote = teamInfo.emote
-            if not teamInfo.nickname == '':
-                nextTeam.name = teamInfo.nickname
-
-            nextTeam.position = teamJSON['position']
-            nextTeam.rank = teamJSON['rank']
-            nextTeam.points = teamJSON['points']
-
-            props = teamJSON['properties']
-            nextTeam.wins = props['wins']
-            nextTeam.losses = props['losses']
-            nextTeam.played = props['played']
-            nextTeam.forfeits = props['forfeits']
-            nextTeam.gamesWon = props['score_for']
-            nextTeam.gamesLost = props['score_against']
-            nextTeam.gameDifference = props['score_difference']
-
-            if nextTeam.points is None:
-                nextTeam.points = 0
-            
-            if nextTeam.rank is None:
-                nextTeam.rank = nextTeam.position
+        rankings = {self.getStageKey(stage): Ranking(stage) for stage in stages}
+
+        failedStageIDs = set()
+
+        # Collects the groups of every stage so each stage is only requested once
+        stageGroups = {}
+        for stage in stages:
+            stageGroups.setdefault(stage.id, []).append(stage.groupID)
+
+        for stageID, groupIDs in stageGroups.items():
+            requestURL = f'https://api.toornament.com/viewer/v2/tournaments/{self.tournamentID}/stages/{stageID}/ranking-items'
+            if not '' in groupIDs:
+                requestURL += f'?group_ids={",".join(sorted(set(groupIDs)))}'
+
+            responseJSON = self.getAllItems(requestURL, 'items')
+            if responseJSON is None:
+                failedStageIDs.add(stageID)
+                continue
+
+            # Splits the combined response into the rankings of the single groups and the whole stage
+            for teamJSON in responseJSON:
+                for ranking in self.findEntries(rankings, stageID, teamJSON.get('group_id', '')):
+                    ranking.teams += [self.parseTeamJSON(teamJSON)]
 
-            ranking.teams += [nextTeam]
-        
         # Sort team by toornament display order (based on ranking)
-        ranking.teams = sorted(ranking.teams, key = lambda team: team.position)
+        for ranking in rankings.values():
+            ranking.teams = sorted(ranking.teams, key = lambda team: team.position)
+
+        # Serves the last good snapshot for stages that couldn't be fetched and remembers the others as last good
+        fetchTime = datetime.datetime.now()
+        for stage in stages:
+            key = self.getStageKey(stage)
+            if stage.id in failedStageIDs:
+                rankings[key] = self.getLastGoodRanking(stage)
+            else:
+                rankings[key].fetchTime = fetchTime
+                self.lastRankings[key] = rankings[key]
+                self.staleStages.pop(key, None)
+
+        return [rankings[self.getStageKey(stage)] for stage in stages]
 
+    # Returns a stale copy of the last ranking of a stage that was fetched successfully
+    # Falls back to the snapshot history after restarts, returns an empty stale ranking if there is none
+    def getLastGoodRanking(self, stage):
+        key = self.getStageKey(stage)
+        self.staleStages[key] = stage
+
+        lastRanking = self.lastRankings.get(key)
+        if lastRanking is None:
+            lastRanking = self.getHistoricRanking(stage)
+
+        ranking = Ranking(stage)
+        if lastRanking is not None:
+            ranking.week = lastRanking.week
+            ranking.teams = list(lastRanking.teams)
+            ranking.fetchTime = lastRanking.fetchTime
+
+        ranking.stale = True
         return ranking
 
+    # Tries to fetch all stages again that were served stale
+    # Does nothing while the circuit breaker is open
+    def revalidate(self):
+        if self.staleStages == {} or self.circuit.isOpen():
+            return False
+
+        stages = list(self.staleStages.values())
+        self.staleStages = {}
+
+        self.getRankings(stages)
+        self.getFixtureIndexes(stages)
+        for stage in stages:
+            index = self.fixtureIndexes.get(self.getStageKey(stage))
+            if index is None or index.stale:
+                self.staleStages[self.getStageKey(stage)] = stage
+
+        return self.staleStages == {}
+
+    # Converts the JSON data of a single ranking item from the API into a team object
+    def parseTeamJSON(self, teamJSON):
+        nextTeam = Team()
+
+        nextTeam.name, nextTeam.emote = self.getTeamDisplayInfo(teamJSON['participant']['name'])
+
+        nextTeam.position = teamJSON['position']
+        nextTeam.rank = teamJSON['rank']
+        nextTeam.points = teamJSON['points']
+
+        props = teamJSON['properties']
+        nextTeam.wins = props['wins']
+        nextTeam.losses = props['losses']
+        nextTeam.played = props['played']
+        nextTeam.forfeits = props['forfeits']
+        nextTeam.gamesWon = props['score_for']
+        nextTeam.gamesLost = props['score_against']
+        nextTeam.gameDifference = props['score_difference']
+
+        if nextTeam.points is None:
+            nextTeam.points = 0
+        
+        if nextTeam.rank is None:
+            nextTeam.rank = nextTeam.position
+
+        return nextTeam
+
+    # Returns the key under which data of a stage group is cached
+    def getStageKey(self, stage):
+        return (stage.id, stage.groupID)
+
 
     # Returns the fixtures of the given week in the given stage
     # Returns empty list for API errors
     def getMatches(self, stage, week):
 
-        self.cooldownAPI()
-
-        responseJSON = {}
         matches = []
 
-        # Either reads match data from toornament API or manually reported CSV file
+        # Either reads match data from the whole-stage fixture index or manually reported CSV file
         if self.enableAPI:
-            requestURL = f'https://api.toornament.com/viewer/v2/tournaments/{self.tournamentID}/matches?round_numbers={week}&stage_ids={stage.id}'
-            if not stage.groupID == '':
-                requestURL += f'&group_ids={stage.groupID}'
-
-            modifiedHeaders = self.headers
-            modifiedHeaders['Range'] = 'matches=0-49'
+            index = self.getFixtureIndex(stage, int(week))
 
-            response = requests.get(url = requestURL, headers = self.headers)
+            # Falls back to the last recorded fixtures if the stage was never fetched since the start
+            if index is None:
+                historicMatches = self.getHistoricMatches(stage, week)
+                return [] if historicMatches is None else historicMatches
 
-            if response.status_code == 206:
-                responseJSON = response.json()
-            else:
-                return []
+            # Copies matches so rendering can't change the indexed data
+            return [copy.copy(match) for match in index.getRound(int(week))]
         else:
             try:
                 csvFile = open(f'{self.baseFolder}{stage.id}_{stage.groupID}_week{week}.csv', 'r')
@@ -327,60 +723,362 @@ class Toornament:
                 for csvLine in csvFile:
                     match = Match()
                     match.fromCSV(csvLine)
-                    homeTeamInfo = self.getTeam(match.homeTeamName)
-                    awayTeamInfo = self.getTeam(match.awayTeamName)
-                    match.homeTeamEmote = homeTeamInfo.emote
-                    match.awayTeamEmote = awayTeamInfo.emote
-                    if not homeTeamInfo.nickname == '':
-                        match.homeTeamName = homeTeamInfo.nickname
-                    if not awayTeamInfo.nickname == '':
-                        match.awayTeamName = awayTeamInfo.nickname
+                    match.homeTeamName, match.homeTeamEmote = self.getTeamDisplayInfo(match.homeTeamName)
+                    match.awayTeamName, match.awayTeamEmote = self.getTeamDisplayInfo(match.awayTeamName)
                     matches += [match]
 
                 csvFile.close()
                 return matches
             except:
-                return Ranking(stage)
+                return []
 
-            # with open(f'{stage.id}_{stage.groupID}_week{week}.json', 'r') as jsonFile:
-            #     responseJSON = json.load(jsonFile)
-
-        # Reads match information for every match
-        for matchJSON in responseJSON:
-            nextMatch = Match()
-            nextMatch.number = matchJSON['number']
-
-            opponents = matchJSON['opponents']
-            homeTeam = opponents[0]
-            awayTeam = opponents[1]
-
-            homeInfo = self.getTeam(homeTeam['participant']['name'])
-            nextMatch.homeTeamName = homeInfo.name
-            nextMatch.homeTeamEmote = homeInfo.emote
-            if not homeInfo.nickname == '':
-                nextMatch.homeTeamName = homeInfo.nickname
-
-            awayInfo = self.getTeam(awayTeam['participant']['name'])
-            nextMatch.awayTeamName = awayInfo.name
-            nextMatch.awayTeamEmote = awayInfo.emote
-            if not awayInfo.nickname == '':
-                nextMatch.awayTeamName = awayInfo.nickname
-            
-            if matchJSON['status'] == 'completed':
-                nextMatch.pending = False
-                nextMatch.homeScore = homeTeam['score']
-                nextMatch.awayScore = awayTeam['score']
-                nextMatch.homeForfeit = homeTeam['forfeit']
-                nextMatch.awayForfeit = awayTeam['forfeit']
-
-            matches += [nextMatch]
+    # Returns the first week of the given stage that still has unfinished matches, starting at the last week with a result
+    # so a postponed match doesn't hold back the current week, falls back to the last week if all matches were played
+    def getCurrentWeek(self, stage):
+
+        if self.enableAPI:
+            index = self.getFixtureIndex(stage)
+            if not index is None:
+                return index.getCurrentRound()
+
+            # Uses the last recorded week if the stage was never fetched since the start
+            entry = self.history.findByTime(self.getStageKey(stage), SnapshotLog.MATCHES, float('inf'))
+            return 1 if entry is None else entry[1]
+
+        # Checks manually reported fixture files from the first to the last week
+        weeks = self.getReportedWeeks(stage)
+        if weeks == []:
+            return 1
+
+        weekMatches = [(week, self.getMatches(stage, week)) for week in weeks]
+        firstWeek = weeks[0]
+        for week, matches in weekMatches:
+            if any(not match.pending for match in matches):
+                firstWeek = week
+
+        for week, matches in weekMatches:
+            if week >= firstWeek and any(match.pending for match in matches):
+                return week
+
+        return weeks[-1]
+
+    # Returns the last week of a stage up to which all matches are finished, the current standings are the standings after it
+    # Returns 0 while the first week is still being played and None if the fixtures of the stage weren't fetched yet
+    def getCompletedWeek(self, stage):
+
+        if self.enableAPI:
+            index = self.fixtureIndexes.get(self.getStageKey(stage))
+            return None if index is None else index.getCompletedRound()
+
+        completedWeek = 0
+        for week in self.getReportedWeeks(stage):
+            if any(match.pending for match in self.getMatches(stage, week)):
+                break
+            completedWeek = week
+
+        return completedWeek
+
+    # Returns the sorted numbers of all weeks of a stage with manually reported fixtures
+    def getReportedWeeks(self, stage):
+        weekPattern = re.compile(f'^{re.escape(stage.id)}_{re.escape(stage.groupID)}_week([0-9]+)\\.csv$')
+        weeks = []
+        try:
+            for fileName in os.listdir(self.baseFolder):
+                fileMatch = weekPattern.match(fileName)
+                if fileMatch:
+                    weeks += [int(fileMatch.group(1))]
+        except OSError:
+            return []
+
+        return sorted(weeks)
+
+    # Returns all fixtures of the given stage, played and unplayed
+    def getStageMatches(self, stage):
+        if not self.enableAPI:
+            matches = []
+            for week in self.getReportedWeeks(stage):
+                matches += self.getMatches(stage, week)
+            return matches
+
+        index = self.getFixtureIndex(stage)
+        if index is None:
+            return []
+
+        return [copy.copy(match) for match in index.matches.values()]
+
+    # Returns the fixture index of the given stage, fetching or refreshing it from the API if necessary
+    # Refreshes the given week and the unfinished rounds before it, see getRefreshRounds
+    # Returns None if the stage couldn't be fetched yet
+    def getFixtureIndex(self, stage, week = None):
+        return self.getFixtureIndexes([stage], week).get(self.getStageKey(stage))
+
+    # Returns the fixture indexes of several stages, keyed by stage and group ID
+    # Stages that need to be fetched or refreshed share the same API calls
+    # The result feed refreshes more rounds than commands, see getRefreshRounds
+    def getFixtureIndexes(self, stages, week = None, feed = False):
+        now = datetime.datetime.now()
+
+        # Fetches all stages at once which weren't fetched yet or whose last full fetch is too old
+        missingStages = []
+        for stage in stages:
+            index = self.fixtureIndexes.get(self.getStageKey(stage))
+            if index is None or now - index.lastFullFetch > self.fixtureFullRefreshTime:
+                missingStages += [stage]
+
+        fetchedIndexes = {}
+        if not missingStages == []:
+            fetchedIndexes = self.fetchFixtureIndexes(missingStages)
+            self.fixtureIndexes.update(fetchedIndexes)
+
+            # Keeps serving outdated indexes if they couldn't be fetched again
+            for stage in missingStages:
+                index = self.fixtureIndexes.get(self.getStageKey(stage))
+                if index is not None and not self.getStageKey(stage) in fetchedIndexes:
+                    index.stale = True
+
+        # Refetches only the rounds which still have unfinished matches and weren't refreshed recently
+        staleIndexes = []
+        staleRoundIDs = []
+        for stage in stages:
+            key = self.getStageKey(stage)
+            index = self.fixtureIndexes.get(key)
+            if index is None or key in fetchedIndexes:
+                continue
+
+            roundIDs = index.getStaleRoundIDs(self.getRefreshRounds(index, week, feed), now - self.fixtureRefreshTime)
+            if not roundIDs == []:
+                staleIndexes += [index]
+                staleRoundIDs += roundIDs
+
+        if not staleRoundIDs == []:
+            success = self.refreshFixtureIndexes(staleIndexes, staleRoundIDs)
+            for index in staleIndexes:
+                index.stale = not success
+                if success:
+                    index.lastSuccess = now
+
+        indexes = {}
+        for stage in stages:
+            key = self.getStageKey(stage)
+            if key in self.fixtureIndexes:
+                indexes[key] = self.fixtureIndexes[key]
+
+        return indexes
+
+    # Returns the numbers of the rounds of an index that are refreshed unless they were refreshed recently
+    # The requested round is refreshed even if it's finished so score corrections show up, together with the unfinished rounds before it
+    # Without a requested week the round after the current one is included, so its results are noticed while a postponed match is still open
+    # The result feed refreshes every round with unfinished matches and the last rounds with results to report late results and corrections
+    def getRefreshRounds(self, index, week, feed = False):
+        if feed:
+            return index.getPendingRounds() | index.getLastPlayedRounds(self.feedCorrectionRounds)
+
+        if week is None:
+            week = index.getCurrentRound()
+            return index.getPendingRounds(week + 1) | {week}
+
+        return index.getPendingRounds(week) | {week}
+
+    # Fetches all rounds and matches of several stages with one query each and builds a fixture index per stage
+    # Returns an empty dictionary for API errors
+    def fetchFixtureIndexes(self, stages):
+        baseURL = f'https://api.toornament.com/viewer/v2/tournaments/{self.tournamentID}'
+        stageFilter = f'stage_ids={",".join(sorted(set(stage.id for stage in stages)))}'
+
+        # Whole stages without a group can't be combined with a group filter
+        groupIDs = [stage.groupID for stage in stages]
+        if not '' in groupIDs:
+            stageFilter += f'&group_ids={",".join(sorted(set(groupIDs)))}'
+
+        roundsJSON = self.getAllItems(f'{baseURL}/rounds?{stageFilter}', 'rounds')
+        if roundsJSON is None:
+            return {}
+
+        matchesJSON = self.getAllItems(f'{baseURL}/matches?{stageFilter}', 'matches', pageSize = 128)
+        if matchesJSON is None:
+            return {}
+
+        # Splits the combined response into the indexes of the single stage groups
+        indexes = {self.getStageKey(stage): FixtureIndex(stage) for stage in stages}
+
+        for roundJSON in roundsJSON:
+            for index in self.findEntries(indexes, roundJSON['stage_id'], roundJSON['group_id']):
+                index.roundNumbers[roundJSON['id']] = roundJSON['number']
+
+        for matchJSON in matchesJSON:
+            for index in self.findEntries(indexes, matchJSON['stage_id'], matchJSON['group_id']):
+                index.add(self.parseMatchJSON(matchJSON, index.roundNumbers))
+
+        fetchTime = datetime.datetime.now()
+        for index in indexes.values():
+            index.lastFullFetch = fetchTime
+            index.lastSuccess = fetchTime
+            for roundID in index.roundNumbers:
+                index.roundRefreshes[roundID] = fetchTime
+
+        return indexes
+
+    # Returns the entries of a dictionary keyed by stage and group ID that an item of the given group belongs to
+    # Items belong to their group and to the whole stage, both can be requested together
+    def findEntries(self, entries, stageID, groupID):
+        keys = [(stageID, groupID)] if groupID == '' else [(stageID, groupID), (stageID, '')]
+        return [entries[key] for key in keys if key in entries]
+
+    # Refetches all matches of the given rounds with one query and sorts them into the given indexes
+    # Keeps the previous matches in case of API errors
+    def refreshFixtureIndexes(self, indexes, roundIDs):
+        requestURL = f'https://api.toornament.com/viewer/v2/tournaments/{self.tournamentID}/matches?round_ids={",".join(sorted(set(roundIDs)))}'
+        matchesJSON = self.getAllItems(requestURL, 'matches', pageSize = 128)
+        if matchesJSON is None:
+            return False
+
+        # A round belongs to the index of its group and to the index of its whole stage if both are refreshed
+        roundIndexes = {}
+        for index in indexes:
+            for roundID in index.roundNumbers:
+                roundIndexes.setdefault(roundID, []).append(index)
+
+        for matchJSON in matchesJSON:
+            for index in roundIndexes.get(matchJSON['round_id'], []):
+                index.add(self.parseMatchJSON(matchJSON, index.roundNumbers))
+
+        refreshTime = datetime.datetime.now()
+        for roundID in roundIDs:
+            for index in roundIndexes.get(roundID, []):
+                index.roundRefreshes[roundID] = refreshTime
+
+        return True
+
+    # Converts the JSON data of a single match from the API into a match object
+    def parseMatchJSON(self, matchJSON, roundNumbers):
+        nextMatch = Match()
+        nextMatch.id = matchJSON['id']
+        nextMatch.number = matchJSON['number']
+        nextMatch.stageID = matchJSON.get('stage_id', '')
+        nextMatch.groupID = matchJSON.get('group_id', '')
+        nextMatch.roundID = matchJSON.get('round_id', '')
+        nextMatch.roundNumber = roundNumbers.get(nextMatch.roundID, 0)
+
+        opponents = matchJSON['opponents']
+        homeTeam = opponents[0]
+        awayTeam = opponents[1]
+
+        nextMatch.homeTeamName, nextMatch.homeTeamEmote = self.getTeamDisplayInfo(homeTeam['participant']['name'])
+        nextMatch.awayTeamName, nextMatch.awayTeamEmote = self.getTeamDisplayInfo(awayTeam['participant']['name'])
         
-        return matches
+        if matchJSON['status'] == 'completed':
+            nextMatch.pending = False
+            nextMatch.homeScore = homeTeam['score']
+            nextMatch.awayScore = awayTeam['score']
+            nextMatch.homeForfeit = homeTeam['forfeit']
+            nextMatch.awayForfeit = awayTeam['forfeit']
+
+        return nextMatch
     
+    # Appends a ranking snapshot to the history
+    def recordRanking(self, ranking, week):
+        try:
+            payload = struct.pack('<H', len(ranking.teams)) + b''.join(team.toBytes() for team in ranking.teams)
+            self.history.append(self.getStageKey(ranking.stage), SnapshotLog.RANKING, int(week), zlib.compress(payload))
+            return True
+        except:
+            print(f'Error recording ranking of {ranking.stage.name}')
+            return False
+
+    # Appends a snapshot of the matches of a week to the history
+    def recordMatches(self, stage, week, matches):
+        try:
+            payload = struct.pack('<H', len(matches)) + b''.join(match.toBytes() for match in matches)
+            self.history.append(self.getStageKey(stage), SnapshotLog.MATCHES, int(week), zlib.compress(payload))
+            return True
+        except:
+            print(f'Error recording matches of {stage.name}')
+            return False
+
+    # Converts a ranking snapshot from the history back into a ranking
+    def decodeRanking(self, stage, week, payload):
+        ranking = Ranking(stage)
+        ranking.week = week
+
+        data = zlib.decompress(payload)
+        offset = 2
+        for _ in range(struct.unpack_from('<H', data)[0]):
+            team = Team()
+            offset = team.fromBytes(data, offset)
+            teamInfo = self.getTeam(team.name)
+            if teamInfo is not None:
+                team.emote = teamInfo.emote
+            ranking.teams += [team]
+
+        return ranking
+
+    # Converts a match snapshot from the history back into a list of matches
+    def decodeMatches(self, payload):
+        matches = []
+
+        data = zlib.decompress(payload)
+        offset = 2
+        for _ in range(struct.unpack_from('<H', data)[0]):
+            match = Match()
+            offset = match.fromBytes(data, offset)
+            homeTeamInfo = self.getTeam(match.homeTeamName)
+            awayTeamInfo = self.getTeam(match.awayTeamName)
+            if homeTeamInfo is not None:
+                match.homeTeamEmote = homeTeamInfo.emote
+            if awayTeamInfo is not None:
+                match.awayTeamEmote = awayTeamInfo.emote
+            matches += [match]
+
+        return matches
+
+    # Returns the standings of a stage as they were after the given week or at the given time (seconds since epoch)
+    # Returns None if no snapshot was recorded until then
+    def getHistoricRanking(self, stage, week = None, timestamp = None):
+        key = self.getStageKey(stage)
+        if week is not None:
+            entry = self.history.findByWeek(key, SnapshotLog.RANKING, int(week))
+        else:
+            entry = self.history.findByTime(key, SnapshotLog.RANKING, float('inf') if timestamp is None else timestamp)
+
+        if entry is None:
+            return None
+
+        ranking = self.decodeRanking(stage, entry[1], self.history.read(key, entry))
+        ranking.fetchTime = datetime.datetime.fromtimestamp(entry[0])
+        return ranking
+
+    # Returns the last recorded fixtures of the given week of a stage or None if none were recorded
+    def getHistoricMatches(self, stage, week):
+        key = self.getStageKey(stage)
+        entry = self.history.findByWeek(key, SnapshotLog.MATCHES, int(week))
+        if entry is None or not entry[1] == int(week):
+            return None
+
+        return self.decodeMatches(self.history.read(key, entry))
+
+    # Returns the rank of a team in every recorded ranking snapshot of a stage as tuples of timestamp, week and rank
+    def getRankHistory(self, stage, teamName):
+        teamInfo = self.getTeam(teamName)
+        names = [teamName]
+        if teamInfo is not None:
+            names = [teamInfo.name, teamInfo.nickname]
+
+        rankHistory = []
+        for timestamp, week, payload in self.history.getAll(self.getStageKey(stage), SnapshotLog.RANKING):
+            for team in self.decodeRanking(stage, week, payload).teams:
+                if team.name in names:
+                    rankHistory += [(timestamp, week, team.rank)]
+                    break
+
+        return rankHistory
+
     # Writes the standings provided as text into a CSV file so they can be loaded later on
     def reportStandings(self, stageName, standingStr):
         
         stage = self.getStage(stageName)
+        if stage is None:
+            return False
+
         teams = []
 
         standingInfos = re.split('\n', standingStr)
@@ -404,10 +1102,16 @@ class Toornament:
             nextTeam.gamesLost = standingInfos[lineIndex+9]
             nextTeam.gameDifference = standingInfos[lineIndex+10]
             nextTeam.points = standingInfos[lineIndex+11]
-            nextTeam.emote = self.getTeam(nextTeam.name).emote
+            nextTeam.emote = self.getTeamDisplayInfo(nextTeam.name)[1]
 
             teams += [nextTeam]
         
+        ranking = Ranking(stage)
+        ranking.teams = teams
+        completedWeek = self.getCompletedWeek(stage)
+        if completedWeek is not None:
+            self.recordRanking(ranking, completedWeek)
+
         try:
             rankFile = open(f'{self.baseFolder}{stage.id}_{stage.groupID}.csv', 'w')
 
@@ -493,6 +1197,8 @@ class Toornament:
                 currentMatch = Match()
                 state = 0
 
+        self.recordMatches(stage, int(weekNumber), matches)
+
         # Writes all matches to CSV file
         try:
             matchesFile = open(f'{self.baseFolder}{stage.id}_{stage.groupID}_week{weekNumber}.csv', 'w')
@@ -509,8 +1215,23 @@ class Toornament:
 # Stores information of a game week like upcoming matches and standings
 class Week:
     def __init__(self):
+        self.number = 0
         self.matches = []
         self.standings = {}
+        self.stale = False
+        self.fetchTime = None
+
+    # Returns a text saying how old stale data is, e.g. '5 minutes'
+    def getAgeText(self):
+        if self.fetchTime is None:
+            return 'unknown time'
+
+        minutes = int((datetime.datetime.now() - self.fetchTime).total_seconds() / 60)
+        if minutes < 60:
+            return f'{minutes} minute' + ('' if minutes == 1 else 's')
+        elif minutes < 48 * 60:
+            return f'{minutes // 60} hour' + ('' if minutes // 60 == 1 else 's')
+        return f'{minutes // (24 * 60)} days'
 
     # Returns a text containing all upcoming, unplayed fixtures including team emotes
     def getMatchesText(self):
@@ -538,12 +1259,19 @@ class Match:
         self.awayTeamName = awayTeamName
         self.homeTeamEmote = homeTeamEmote
         self.awayTeamEmote = awayTeamEmote
-        self.homeScore = homeScore,
-        self.awayScore = awayScore,
+        self.homeScore = homeScore
+        self.awayScore = awayScore
         self.pending = pending
         self.homeForfeit = False
         self.awayForfeit = False
 
+        # Identifies the match on toornament, only set for matches read from the API
+        self.id = ''
+        self.stageID = ''
+        self.groupID = ''
+        self.roundID = ''
+        self.roundNumber = 0
+
     # Converts match information to a string containing the team names and emotes
     def toString(self):
         if self.pending:
@@ -563,6 +1291,40 @@ class Match:
 
             return f"{self.homeTeamName} {self.homeTeamEmote} {self.homeScore}-{self.awayScore} {self.awayTeamEmote} {self.awayTeamName}"
     
+    # Returns everything that makes up the result of a match, used to detect result changes
+    def getResultState(self):
+        if self.pending:
+            return (True,)
+        return (False, self.homeScore, self.awayScore, self.homeForfeit, self.awayForfeit)
+
+    # Packs match details into bytes for the snapshot history, missing scores are stored as -1
+    def toBytes(self):
+        homeName = self.homeTeamName.encode('utf-8')
+        awayName = self.awayTeamName.encode('utf-8')
+        homeScore = self.homeScore if isinstance(self.homeScore, int) and not self.pending else -1
+        awayScore = self.awayScore if isinstance(self.awayScore, int) and not self.pending else -1
+        flags = int(self.pending) | int(self.homeForfeit) << 1 | int(self.awayForfeit) << 2
+
+        return (struct.pack('<iHBhhHH', self.number, self.roundNumber, flags, homeScore, awayScore, len(homeName), len(awayName))
+            + homeName + awayName)
+
+    # Reads match details packed by toBytes at the given offset and returns the offset after them
+    def fromBytes(self, data, offset):
+        self.number, self.roundNumber, flags, homeScore, awayScore, homeLength, awayLength = struct.unpack_from('<iHBhhHH', data, offset)
+        offset += struct.calcsize('<iHBhhHH')
+
+        self.pending = bool(flags & 1)
+        self.homeForfeit = bool(flags & 2)
+        self.awayForfeit = bool(flags & 4)
+        if not self.pending:
+            self.homeScore = None if homeScore == -1 else homeScore
+            self.awayScore = None if awayScore == -1 else awayScore
+
+        self.homeTeamName = data[offset:offset + homeLength].decode('utf-8')
+        offset += homeLength
+        self.awayTeamName = data[offset:offset + awayLength].decode('utf-8')
+        return offset + awayLength
+
     # Writes match details to CSV for serialization
     def toCSV(self):
         return f'{self.number};{self.homeTeamName};{self.homeScore};{self.awayTeamName};{self.awayScore};{self.pending}'
@@ -571,10 +1333,111 @@ class Match:
         columns = re.split(';', csvLine)
         self.number = int(columns[0])
         self.homeTeamName = columns[1]
-        self.homeTeamScore = int(columns[2])
+        self.homeScore = int(columns[2])
         self.awayTeamName = columns[3]
-        self.awayTeamScore = int(columns[4])
-        self.pending = bool(columns[5])
+        self.awayScore = int(columns[4])
+        self.pending = columns[5].strip() == 'True'
+
+
+# Index of all fixtures of a stage, looked up by round number and team
+class FixtureIndex:
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.matches = {}
+        self.roundNumbers = {}
+        self.rounds = {}
+        self.teams = {}
+        self.roundRefreshes = {}
+        self.changedMatches = {}
+        self.lastFullFetch = datetime.datetime.now()
+
+        # Set if the last fetch or refresh failed, lastSuccess is the time of the last successful one
+        self.stale = False
+        self.lastSuccess = self.lastFullFetch
+
+    # Adds a match to the index or replaces the previous version of it
+    # Remembers matches whose result changed so they can be collected with popChanges
+    def add(self, match):
+        previous = self.matches.get(match.id)
+        if previous is not None:
+            self.remove(previous)
+
+            if not previous.getResultState() == match.getResultState():
+                if match.id in self.changedMatches:
+                    previous = self.changedMatches[match.id][0]
+                self.changedMatches[match.id] = (previous, match)
+
+        self.matches[match.id] = match
+        self.rounds.setdefault(match.roundNumber, {})[match.id] = match
+        self.teams.setdefault(match.homeTeamName, {})[match.id] = match
+        self.teams.setdefault(match.awayTeamName, {})[match.id] = match
+
+    # Removes a match from the index
+    def remove(self, match):
+        self.matches.pop(match.id, None)
+        self.rounds.get(match.roundNumber, {}).pop(match.id, None)
+        self.teams.get(match.homeTeamName, {}).pop(match.id, None)
+        self.teams.get(match.awayTeamName, {}).pop(match.id, None)
+
+    # Returns all (previous, current) match pairs whose result changed since the last call and forgets them
+    def popChanges(self):
+        changes = list(self.changedMatches.values())
+        self.changedMatches = {}
+        return changes
+
+    # Returns all matches of the given round sorted by match number
+    def getRound(self, roundNumber):
+        return sorted(self.rounds.get(roundNumber, {}).values(), key = lambda match: match.number)
+
+    # Returns the numbers of all rounds that still contain unfinished matches, only up to the given round number if one is given
+    def getPendingRounds(self, maxRoundNumber = None):
+        return {match.roundNumber for match in self.matches.values() if match.pending and (maxRoundNumber is None or match.roundNumber <= maxRoundNumber)}
+
+    # Returns the numbers of the given number of last rounds that have at least one finished match
+    def getLastPlayedRounds(self, count):
+        playedRounds = sorted({match.roundNumber for match in self.matches.values() if not match.pending})
+        return set(playedRounds[-count:]) if count > 0 else set()
+
+    # Returns the IDs of the rounds with the given numbers that weren't refreshed since the given time
+    # A round number has one round ID per group if the index covers a whole stage
+    def getStaleRoundIDs(self, roundNumbers, refreshedBefore):
+        staleRoundIDs = []
+        for roundID, roundNumber in self.roundNumbers.items():
+            if roundNumber in roundNumbers:
+                lastRefresh = self.roundRefreshes.get(roundID)
+                if lastRefresh is None or lastRefresh <= refreshedBefore:
+                    staleRoundIDs += [roundID]
+
+        return sorted(staleRoundIDs)
+
+    # Returns the first round that still has unfinished matches, starting at the last round with a result
+    # Earlier rounds with postponed matches are skipped, returns the last round if all matches are finished
+    def getCurrentRound(self):
+        roundNumbers = sorted(number for number, matches in self.rounds.items() if len(matches) > 0)
+        if roundNumbers == []:
+            return 1
+
+        firstRound = roundNumbers[0]
+        for roundNumber in roundNumbers:
+            if any(not match.pending for match in self.rounds[roundNumber].values()):
+                firstRound = roundNumber
+
+        for roundNumber in roundNumbers:
+            if roundNumber >= firstRound and any(match.pending for match in self.rounds[roundNumber].values()):
+                return roundNumber
+
+        return roundNumbers[-1]
+
+    # Returns the last round up to which all matches are finished, 0 if the first round still has unfinished matches
+    def getCompletedRound(self):
+        completedRound = 0
+        for roundNumber in sorted(number for number, matches in self.rounds.items() if len(matches) > 0):
+            if any(match.pending for match in self.rounds[roundNumber].values()):
+                break
+            completedRound = roundNumber
+
+        return completedRound
 
         
 # Complete standings of all teams in a stage
@@ -585,6 +1448,10 @@ class Ranking:
         self.week = 1
         self.teams = []
 
+        # Time the ranking was fetched, stale rankings are old snapshots served because the API couldn't be reached
+        self.fetchTime = None
+        self.stale = False
+
     # Returns how many characters wide the rank column of the standings table must be
     def getRankPadding(self) -> int:
         maxRank = 1
@@ -686,6 +1553,23 @@ class Team:
     def toCSV(self):
         return f'{self.name};{self.position};{self.rank};{self.points};{self.wins};{self.losses};{self.played};{self.forfeits};{self.gamesWon};{self.gamesLost};{self.gameDifference}'
 
+    # Packs ranking details into bytes for the snapshot history
+    def toBytes(self):
+        name = self.name.encode('utf-8')
+        values = [self.position, self.rank, self.points, self.wins, self.losses, self.played, self.forfeits, self.gamesWon, self.gamesLost, self.gameDifference]
+        return struct.pack('<H', len(name)) + name + struct.pack('<10i', *[int(value) for value in values])
+
+    # Reads ranking details packed by toBytes at the given offset and returns the offset after them
+    def fromBytes(self, data, offset):
+        nameLength = struct.unpack_from('<H', data, offset)[0]
+        offset += 2
+        self.name = data[offset:offset + nameLength].decode('utf-8')
+        offset += nameLength
+
+        (self.position, self.rank, self.points, self.wins, self.losses, self.played,
+            self.forfeits, self.gamesWon, self.gamesLost, self.gameDifference) = struct.unpack_from('<10i', data, offset)
+        return offset + 40
+
     def fromCSV(self, csvLine):
         columns = re.split(';', csvLine)
         self.name = columns[0]
@@ -0,0 +1,42 @@
+import os
+
+
+# Notices changes to files by polling their modification time and size
+# A change is only reported once the file stayed the same for two polls, so files that are still being written aren't read
+class FileWatcher:
+
+    def __init__(self, paths):
+        self.states = {path: self.getState(path) for path in paths}
+
+        # States of changed files that weren't stable yet by path
+        self.pendingStates = {}
+
+    # Returns modification time and size of a file or None if it doesn't exist
+    def getState(self, path):
+        try:
+            fileStats = os.stat(path)
+            return (fileStats.st_mtime_ns, fileStats.st_size)
+        except OSError:
+            return None
+
+    # Returns all existing files that changed since the last check and didn't change again since the check before
+    def getChangedFiles(self):
+        changedFiles = []
+        for path, previousState in self.states.items():
+            state = self.getState(path)
+            if state == previousState:
+                self.pendingStates.pop(path, None)
+            elif path in self.pendingStates and state == self.pendingStates[path]:
+                del self.pendingStates[path]
+                self.states[path] = state
+                if state is not None:
+                    changedFiles += [path]
+            else:
+                self.pendingStates[path] = state
+
+        return changedFiles
+
+    # Remembers the current state of a file, e.g. after the bot wrote it itself
+    def update(self, path):
+        self.states[path] = self.getState(path)
+        self.pendingStates.pop(path, None)
@@ -0,0 +1,102 @@
+import time
+import asyncio
+import itertools
+import collections
+
+
+# Raised if a work item is submitted while the queue is full
+class QueueFullError(Exception):
+    pass
+
+
+# Central queue for work triggered by commands
+# Identical work that is queued or running is merged, work with lower priority values runs first
+# At most a fixed number of items run at the same time and new work is rejected while the queue is full
+# Work has to run blocking calls in an executor, otherwise it blocks the other workers and the event loop
+class WorkQueue:
+
+    HIGH = 0
+    LOW = 1
+
+    def __init__(self, maxSize = 20, concurrency = 2, metricsWindow = 100):
+        self.maxSize = maxSize
+        self.concurrency = concurrency
+        self.queue = None
+        self.workers = []
+        self.inFlight = {}
+        self.order = itertools.count()
+
+        # Metrics, wait times are kept for the last metricsWindow items
+        self.waitTimes = collections.deque(maxlen = metricsWindow)
+        self.running = 0
+        self.submitted = 0
+        self.merged = 0
+        self.rejected = 0
+        self.failed = 0
+
+    # Starts the workers, needs to be called from within the event loop
+    def start(self):
+        if not self.workers == []:
+            return
+
+        self.queue = asyncio.PriorityQueue()
+        self.workers = [asyncio.ensure_future(self.runWorker()) for _ in range(self.concurrency)]
+
+    # Queues an async function under the given key and waits until it ran, returns its result
+    # Waits for the queued or running work instead if work with the same key is already in flight
+    async def submit(self, key, priority, work):
+        self.start()
+
+        if key in self.inFlight:
+            self.merged += 1
+            return await asyncio.shield(self.inFlight[key])
+
+        if self.queue.qsize() >= self.maxSize:
+            self.rejected += 1
+            raise QueueFullError(f'Work queue is full ({self.maxSize} items)')
+
+        future = asyncio.get_running_loop().create_future()
+        self.inFlight[key] = future
+        self.submitted += 1
+        self.queue.put_nowait((priority, next(self.order), time.monotonic(), key, work))
+
+        return await asyncio.shield(future)
+
+    # Takes work from the queue by priority and order of submission and runs it
+    async def runWorker(self):
+        while True:
+            priority, order, queuedAt, key, work = await self.queue.get()
+            self.waitTimes.append(time.monotonic() - queuedAt)
+            future = self.inFlight[key]
+
+            self.running += 1
+            try:
+                future.set_result(await work())
+            except Exception as e:
+                self.failed += 1
+                future.set_exception(e)
+            finally:
+                self.running -= 1
+                del self.inFlight[key]
+                self.queue.task_done()
+
+    # Returns the current queue depth and statistics about the processed work
+    def getMetrics(self):
+        waitTimes = list(self.waitTimes)
+        return {
+            'depth': 0 if self.queue is None else self.queue.qsize(),
+            'running': self.running,
+            'submitted': self.submitted,
+            'merged': self.merged,
+            'rejected': self.rejected,
+            'failed': self.failed,
+            'averageWait': sum(waitTimes) / len(waitTimes) if not waitTimes == [] else 0.0,
+            'maxWait': max(waitTimes) if not waitTimes == [] else 0.0
+        }
+
+    # Returns the metrics as text that can be posted in Discord
+    def getMetricsText(self):
+        metrics = self.getMetrics()
+        return (f"Queue: {metrics['depth']}/{self.maxSize} waiting, {metrics['running']}/{self.concurrency} running\n"
+            + f"Submitted: {metrics['submitted']}, merged: {metrics['merged']}, rejected: {metrics['rejected']}, failed: {metrics['failed']}\n"
+            + f"Wait time: {metrics['averageWait']:.2f}s average, {metrics['maxWait']:.2f}s max (last {len(self.waitTimes)})")
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Makes the bot sources and the fake toornament API of the benchmarks importable from the tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'source'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
@@ -0,0 +1,174 @@
+import datetime
+from toornament import Match, Ranking, Team, Stage, FixtureIndex
+from changes import ResultEvent, ChangeDetector, ResultFeed, batchMessages
+from fakeapi import FakeSeason, createToornament
+
+
+STAGE = Stage(name = 'Premier', id = '1000', groupID = '100000', colour = 'FF0000')
+
+# Recorded fixture snapshots of one week, every match is (number, home, away, homeScore, awayScore, pending, homeForfeit, awayForfeit)
+MATCH_SNAPSHOTS = [
+    [(1, 'Alpha', 'Bravo', -1, -1, True, False, False), (2, 'Charlie', 'Delta', -1, -1, True, False, False)],
+    [(1, 'Alpha', 'Bravo', 2, 1, False, False, False), (2, 'Charlie', 'Delta', -1, -1, True, False, False)],
+    [(1, 'Alpha', 'Bravo', 2, 1, False, False, False), (2, 'Charlie', 'Delta', None, None, False, True, False)],
+    [(1, 'Alpha', 'Bravo', 3, 1, False, False, False), (2, 'Charlie', 'Delta', None, None, False, True, False)]
+]
+
+# Recorded ranking snapshots, every team is (name, rank), the empty snapshot is a failed API call
+RANKING_SNAPSHOTS = [
+    [('Alpha', 1), ('Bravo', 2), ('Charlie', 3), ('Delta', 4)],
+    [('Alpha', 1), ('Bravo', 2), ('Charlie', 3), ('Delta', 4)],
+    [],
+    [('Alpha', 1), ('Bravo', 2), ('Delta', 3), ('Charlie', 4)]
+]
+
+
+def createMatches(snapshot):
+    matches = []
+    for number, home, away, homeScore, awayScore, pending, homeForfeit, awayForfeit in snapshot:
+        match = Match(number = number, homeTeamName = home, awayTeamName = away, homeScore = homeScore, awayScore = awayScore, pending = pending)
+        match.id = f'match{number}'
+        match.groupID = STAGE.groupID
+        match.roundNumber = 1
+        match.homeForfeit = homeForfeit
+        match.awayForfeit = awayForfeit
+        matches += [match]
+    return matches
+
+def createRanking(snapshot):
+    ranking = Ranking(STAGE)
+    for name, rank in snapshot:
+        team = Team()
+        team.name = name
+        team.rank = rank
+        team.position = rank
+        ranking.teams += [team]
+    return ranking
+
+def compareAll(detector, snapshots):
+    return [detector.compareMatches(STAGE, createMatches(snapshot)) for snapshot in snapshots]
+
+
+def testFirstSnapshotOnlySetsBaseline():
+    detector = ChangeDetector()
+    assert detector.compareMatches(STAGE, createMatches(MATCH_SNAPSHOTS[1])) == []
+    assert detector.compareRanking(createRanking(RANKING_SNAPSHOTS[0])) == []
+
+def testNewResult():
+    events = compareAll(ChangeDetector(), MATCH_SNAPSHOTS[:2])
+
+    assert events[1][0].kind == ResultEvent.NEW_RESULT
+    assert len(events[1]) == 1
+    assert events[1][0].toString() == 'Alpha  2-1  Bravo'
+
+def testForfeit():
+    events = compareAll(ChangeDetector(), MATCH_SNAPSHOTS[:3])
+
+    assert [event.kind for event in events[2]] == [ResultEvent.FORFEIT]
+    assert events[2][0].match.number == 2
+    assert events[2][0].toString() == 'Charlie  FF-W  Delta (forfeit)'
+
+def testScoreCorrection():
+    events = compareAll(ChangeDetector(), MATCH_SNAPSHOTS)
+
+    assert [event.kind for event in events[3]] == [ResultEvent.CORRECTION]
+    assert events[3][0].toString() == 'Correction: Alpha  3-1  Bravo (was 2-1)'
+
+def testUnchangedSnapshotHasNoEvents():
+    detector = ChangeDetector()
+    compareAll(detector, MATCH_SNAPSHOTS)
+    assert detector.compareMatches(STAGE, createMatches(MATCH_SNAPSHOTS[-1])) == []
+
+def testRankSwap():
+    detector = ChangeDetector()
+    events = [detector.compareRanking(createRanking(snapshot)) for snapshot in RANKING_SNAPSHOTS]
+
+    assert events[1] == []
+    assert sorted((event.teamName, event.previousRank, event.rank) for event in events[3]) == [('Charlie', 3, 4), ('Delta', 4, 3)]
+    assert sorted(event.toString() for event in events[3]) == ['Charlie moved down from #3 to #4', 'Delta moved up from #4 to #3']
+
+def testEmptyRankingKeepsBaseline():
+    detector = ChangeDetector()
+    detector.compareRanking(createRanking(RANKING_SNAPSHOTS[0]))
+
+    assert detector.compareRanking(createRanking(RANKING_SNAPSHOTS[2])) == []
+    assert detector.rankStates[(STAGE.id, STAGE.groupID)] == {'Alpha': 1, 'Bravo': 2, 'Charlie': 3, 'Delta': 4}
+    assert len(detector.compareRanking(createRanking(RANKING_SNAPSHOTS[3]))) == 2
+
+def testFixtureIndexReportsOnlyChangedMatches():
+    index = FixtureIndex(STAGE)
+    detector = ChangeDetector()
+    events = []
+
+    for snapshot in MATCH_SNAPSHOTS:
+        for match in createMatches(snapshot):
+            index.add(match)
+
+        # The first snapshot sets the baseline from the whole index like ResultFeed does after a rebuild
+        if events == []:
+            changedMatches = list(index.matches.values())
+            index.popChanges()
+        else:
+            changedMatches = [match for previous, match in index.popChanges()]
+
+        events += [detector.compareMatches(STAGE, changedMatches)]
+
+    assert [[event.kind for event in snapshotEvents] for snapshotEvents in events] == [
+        [], [ResultEvent.NEW_RESULT], [ResultEvent.FORFEIT], [ResultEvent.CORRECTION]]
+    assert index.popChanges() == []
+
+def testFixtureIndexKeepsFirstPreviousStateUntilPopped():
+    index = FixtureIndex(STAGE)
+    for snapshot in MATCH_SNAPSHOTS[:2] + MATCH_SNAPSHOTS[3:]:
+        for match in createMatches(snapshot):
+            index.add(match)
+
+    changes = {current.id: (previous, current) for previous, current in index.popChanges()}
+    previous, current = changes['match1']
+    assert previous.pending
+    assert (current.homeScore, current.awayScore) == (3, 1)
+
+def testBatchMessagesSplitsLongFeeds():
+    events = [ResultEvent(ResultEvent.RANK_CHANGE, STAGE, teamName = f'Team {index}', previousRank = index + 1, rank = index) for index in range(1, 200)]
+    messages = batchMessages(events, maxLength = 500)
+
+    assert len(messages) > 1
+    assert all(len(message) <= 500 and message.startswith('**Premier**\n') for message in messages)
+    assert sum(message.count('moved up') for message in messages) == len(events)
+
+def createFeed(tmp_path, season):
+    toornament = createToornament(season, folder = str(tmp_path))
+    toornament.fixtureRefreshTime = datetime.timedelta(0)
+    feed = ResultFeed(toornament, 'Feeds.csv')
+    feed.addChannel(toornament.stages[0].name, 1)
+    assert feed.poll() == {}
+    return feed
+
+def testFeedReportsCorrectionOfFinishedWeek(tmp_path):
+    season = FakeSeason(teamsPerGroup = 4, playedRounds = 2)
+    feed = createFeed(tmp_path, season)
+
+    item = next(item for item in season.matches if item['round_number'] == 1)
+    item['opponents'][0]['score'] = 1
+    item['opponents'][1]['score'] = 3
+
+    messages = feed.poll()
+    assert len(messages[1]) == 1 and 'Correction' in messages[1][0] and '(was 3-1)' in messages[1][0]
+    assert feed.poll() == {}
+
+def testFeedReportsResultsAfterPostponedMatch(tmp_path):
+    season = FakeSeason(teamsPerGroup = 4, playedRounds = 1)
+    season.completeRound(2)
+    postponed = next(item for item in season.matches if item['round_number'] == 2)
+    postponed['status'] = 'pending'
+    feed = createFeed(tmp_path, season)
+
+    # Two weeks are played while the postponed match is still open
+    season.completeRound(3)
+    season.completeRound(4)
+    messages = feed.poll()
+    assert messages[1][0].count('\n') == 4
+
+    # The postponed match is reported once it's played
+    postponed['status'] = 'completed'
+    assert feed.poll()[1][0].count('\n') == 1
@@ -0,0 +1,82 @@
+import datetime
+from toornament import Stage
+from fakeapi import FakeSeason, createToornament
+
+
+# Returns the match items of a round in the fake season
+def getRoundItems(season, roundNumber):
+    return [item for item in season.matches if item['round_number'] == roundNumber]
+
+# Changes the result of a match item in the fake season
+def setScore(item, homeScore, awayScore):
+    item['status'] = 'completed'
+    item['opponents'][0]['score'] = homeScore
+    item['opponents'][1]['score'] = awayScore
+
+def testRequestedFinishedWeekShowsCorrections(tmp_path):
+    season = FakeSeason(teamsPerGroup = 4, playedRounds = 2)
+    toornament = createToornament(season, folder = str(tmp_path))
+    stage = toornament.stages[0]
+    assert toornament.getWeekInfo(stage, 1).matches[0].homeScore == 3
+
+    item = getRoundItems(season, 1)[0]
+    setScore(item, 0, 3)
+
+    # Not asked again before the refresh time is up
+    assert toornament.getWeekInfo(stage, 1).matches[0].homeScore == 3
+
+    toornament.fixtureRefreshTime = datetime.timedelta(0)
+    match = toornament.getWeekInfo(stage, 1).matches[0]
+    assert (match.homeScore, match.awayScore) == (0, 3)
+
+def testPostponedMatchDoesNotHoldBackCurrentWeek(tmp_path):
+    season = FakeSeason(teamsPerGroup = 4, playedRounds = 1)
+    toornament = createToornament(season, folder = str(tmp_path))
+    toornament.fixtureRefreshTime = datetime.timedelta(0)
+    stage = toornament.stages[0]
+    assert toornament.getWeekInfo(stage).number == 2
+
+    # One match of week 2 is postponed, week 3 is played in the meantime
+    setScore(getRoundItems(season, 2)[0], 2, 1)
+    assert toornament.getWeekInfo(stage).number == 2
+
+    season.completeRound(3)
+    week = toornament.getWeekInfo(stage)
+    assert week.number == 4
+    assert all(not match.pending for match in toornament.getWeekInfo(stage, 3).matches)
+
+    # The postponed match is still picked up once it's played
+    setScore(getRoundItems(season, 2)[1], 1, 2)
+    toornament.getWeekInfo(stage)
+    assert all(not match.pending for match in toornament.getWeekInfo(stage, 2).matches)
+
+def testOfflinePostponedMatchDoesNotHoldBackCurrentWeek(tmp_path):
+    toornament = createToornament(FakeSeason(teamsPerGroup = 4), enableAPI = False, folder = str(tmp_path))
+    stage = toornament.stages[0]
+
+    toornament.reportFixtures(stage.name, 1, 'A\nlogo\n3\nB\nlogo\n1\nC\nlogo\n2\nD\nlogo\n0')
+    toornament.reportFixtures(stage.name, 2, 'A\nlogo\n3\nC\nlogo\n1\nB\nlogo\nD\nlogo\n ')
+    toornament.reportFixtures(stage.name, 3, 'A\nlogo\nD\nlogo\n \nB\nlogo\nC\nlogo\n ')
+    assert toornament.getCurrentWeek(stage) == 2
+
+    toornament.reportFixtures(stage.name, 3, 'A\nlogo\n3\nD\nlogo\n0\nB\nlogo\nC\nlogo\n ')
+    assert toornament.getCurrentWeek(stage) == 3
+
+def testWholeStageAndItsGroupCanBeRequestedTogether(tmp_path):
+    season = FakeSeason(groupsPerStage = 2, teamsPerGroup = 4, playedRounds = 2)
+    toornament = createToornament(season, folder = str(tmp_path))
+    groupA = toornament.stages[0]
+    wholeStage = Stage('Premier', groupA.id, '', groupA.logoURL, groupA.colourStr, 'P')
+
+    assert [len(ranking.teams) for ranking in toornament.getRankings([wholeStage, groupA])] == [8, 4]
+
+    indexes = toornament.getFixtureIndexes([wholeStage, groupA])
+    assert len(indexes[toornament.getStageKey(wholeStage)].matches) == len(season.matches)
+    assert len(indexes[toornament.getStageKey(groupA)].matches) == len(season.matches) // 2
+
+    # Refreshes reach both indexes as well
+    toornament.fixtureRefreshTime = datetime.timedelta(0)
+    season.completeRound(3)
+    weeks = toornament.getWeekInfos([wholeStage, groupA], 3)
+    assert [len(week.matches) for week in weeks] == [4, 2]
+    assert all(not match.pending for week in weeks for match in week.matches)
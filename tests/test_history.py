@@ -0,0 +1,70 @@
+import os
+import time
+from history import SnapshotLog
+from fakeapi import FakeSeason, createToornament
+
+
+KEY = ('1000', '100000')
+
+
+def testStandingsAreRecordedAfterLastCompletedWeek(tmp_path):
+    toornament = createToornament(FakeSeason(teamsPerGroup = 4, playedRounds = 2), folder = str(tmp_path))
+    stage = toornament.stages[0]
+
+    week = toornament.getWeekInfo(stage)
+    assert week.number == 3
+
+    assert toornament.getHistoricRanking(stage, week = 2).week == 2
+    assert toornament.getHistoricRanking(stage, week = 1) is None
+
+    # Showing an earlier week doesn't file the current standings under it
+    toornament.getWeekInfo(stage, 1)
+    assert toornament.getHistoricRanking(stage, week = 1) is None
+
+def testCompactionIsFinishedAfterCrashBetweenSwaps(tmp_path):
+    log = SnapshotLog(str(tmp_path))
+    for week in range(1, 5):
+        for version in range(3):
+            log.append(KEY, SnapshotLog.RANKING, week, f'week {week} version {version}'.encode(), timestamp = time.time() - 1000 + week * 10 + version)
+
+    # Simulates a crash after the new log was swapped in but before the new index was
+    originalReplace = os.replace
+    calls = []
+    def crashingReplace(source, target):
+        calls.append(source)
+        if len(calls) == 2:
+            raise OSError('crash')
+        originalReplace(source, target)
+
+    os.replace = crashingReplace
+    try:
+        log.compact(KEY)
+    except OSError:
+        pass
+    finally:
+        os.replace = originalReplace
+
+    reopened = SnapshotLog(str(tmp_path))
+    payloads = [payload for timestamp, week, payload in reopened.getAll(KEY, SnapshotLog.RANKING)]
+    assert payloads[:3] == [b'week 1 version 2', b'week 2 version 2', b'week 3 version 2']
+    assert reopened.get(KEY, SnapshotLog.RANKING, week = 4) == b'week 4 version 2'
+    assert not os.path.exists(reopened.getMarkerPath(KEY))
+
+def testIncompleteCompactionIsDiscarded(tmp_path):
+    log = SnapshotLog(str(tmp_path))
+    log.append(KEY, SnapshotLog.RANKING, 1, b'standings')
+
+    logPath, indexPath = log.getPaths(KEY)
+    with open(logPath + '.tmp', 'wb') as logFile:
+        logFile.write(b'partial')
+
+    reopened = SnapshotLog(str(tmp_path))
+    assert reopened.get(KEY, SnapshotLog.RANKING) == b'standings'
+    assert not os.path.exists(logPath + '.tmp')
+
+def testStandingsOfUnknownStageAreRejected(tmp_path):
+    for enableAPI in [True, False]:
+        folder = tmp_path / str(enableAPI)
+        folder.mkdir()
+        toornament = createToornament(FakeSeason(teamsPerGroup = 4), enableAPI = enableAPI, folder = str(folder))
+        assert toornament.reportStandings('Unknown', '') is False
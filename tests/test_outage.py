@@ -0,0 +1,138 @@
+import time
+import circuit
+from circuit import CircuitBreaker
+from fakeapi import FakeSeason, createToornament
+
+
+# Replaces the clock of the circuit breaker so the reset timeout can pass without waiting
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def createClient(folder, playedRounds = 2):
+    season = FakeSeason(teamsPerGroup = 4, playedRounds = playedRounds)
+    return season, createToornament(season, folder = str(folder))
+
+
+def testCircuitOpensAfterThreeFailures(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit, 'time', clock)
+    breaker = CircuitBreaker(failureThreshold = 3, resetTimeout = 60.0)
+
+    for _ in range(2):
+        assert breaker.allowRequest()
+        breaker.recordFailure()
+    assert not breaker.isOpen()
+
+    breaker.recordFailure()
+    assert breaker.isOpen()
+    assert not breaker.allowRequest()
+
+def testCircuitHalfOpensAfterResetTimeoutAndReopensOnFailedTrial(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit, 'time', clock)
+    breaker = CircuitBreaker(failureThreshold = 3, resetTimeout = 60.0)
+    for _ in range(3):
+        breaker.recordFailure()
+
+    clock.now += 59.0
+    assert not breaker.allowRequest()
+
+    clock.now += 1.0
+    assert breaker.allowRequest()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.recordFailure()
+    assert breaker.isOpen()
+    assert not breaker.allowRequest()
+
+    clock.now += 60.0
+    assert breaker.allowRequest()
+    breaker.recordSuccess()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def testRankingIsServedStaleAfterServerError(tmp_path):
+    season, toornament = createClient(tmp_path)
+    stage = toornament.stages[0]
+
+    fresh = toornament.getRankings([stage])[0]
+    assert not fresh.stale and len(fresh.teams) == 4
+
+    toornament.session.failure = 'error'
+    stale = toornament.getRankings([stage])[0]
+
+    assert stale.stale
+    assert stale.fetchTime == fresh.fetchTime
+    assert [team.name for team in stale.teams] == [team.name for team in fresh.teams]
+    assert toornament.getStageKey(stage) in toornament.staleStages
+
+def testOpenCircuitFailsFastWithoutRequests(tmp_path):
+    season, toornament = createClient(tmp_path)
+    stage = toornament.stages[0]
+    toornament.getWeekInfo(stage)
+
+    toornament.session.failure = 'error'
+    for _ in range(3):
+        toornament.getRankings([stage])
+    assert toornament.circuit.isOpen()
+
+    requestCount = toornament.session.requestCount
+    startTime = time.perf_counter()
+    week = toornament.getWeekInfo(stage)
+
+    assert week.stale
+    assert toornament.session.requestCount == requestCount
+    assert time.perf_counter() - startTime < 0.5
+
+def testMatchesFallBackToHistoryAfterRestart(tmp_path):
+    season, toornament = createClient(tmp_path)
+    stage = toornament.stages[0]
+    recorded = toornament.getWeekInfo(stage)
+
+    # A new client on the same data folder starts without fixture index while the API is down
+    season, restarted = createClient(tmp_path)
+    restarted.session.failure = 'timeout'
+    week = restarted.getWeekInfo(stage)
+
+    assert week.stale
+    assert week.number == recorded.number
+    assert [(match.homeTeamName, match.awayTeamName) for match in week.matches] == [(match.homeTeamName, match.awayTeamName) for match in recorded.matches]
+    assert [team.name for team in week.standings.teams] == [team.name for team in recorded.standings.teams]
+
+def testRevalidateClearsStaleStagesOnceApiRecovers(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit, 'time', clock)
+    season, toornament = createClient(tmp_path)
+    stage = toornament.stages[0]
+    toornament.getWeekInfo(stage)
+
+    toornament.session.failure = 'error'
+    toornament.fixtureIndexes = {}
+    for _ in range(3):
+        toornament.getWeekInfo(stage)
+    assert toornament.circuit.isOpen()
+    assert toornament.getStageKey(stage) in toornament.staleStages
+
+    # Nothing is retried while the circuit is open
+    assert not toornament.revalidate()
+    assert toornament.getStageKey(stage) in toornament.staleStages
+
+    toornament.session.failure = None
+    clock.now += toornament.circuit.resetTimeout
+    assert toornament.revalidate()
+    assert toornament.staleStages == {}
+    assert not toornament.getWeekInfo(stage).stale
+
+def testFirstUpdateDuringOutageRequestsFixturesOnce(tmp_path):
+    season, toornament = createClient(tmp_path)
+    toornament.session.failure = 'timeout'
+
+    week = toornament.getWeekInfo(toornament.stages[0])
+
+    assert week.stale
+    assert [url.split('?')[0].split('/')[-1] for url in toornament.session.requestedURLs] == ['ranking-items', 'rounds']
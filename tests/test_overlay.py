@@ -0,0 +1,86 @@
+import gzip
+import json
+import asyncio
+import threading
+import pytest
+from fakeapi import FakeSeason, createToornament
+
+aiohttp = pytest.importorskip('aiohttp')
+from overlay import OverlayServer, acceptsGzip
+
+
+# Starts an overlay server on a free port, runs the requests of the test against it and stops it again
+def runWithServer(tmp_path, test, lock = None):
+    toornament = createToornament(FakeSeason(teamsPerGroup = 4, playedRounds = 2), folder = str(tmp_path))
+    toornament.getWeekInfos(toornament.stages)
+
+    async def run():
+        server = OverlayServer(toornament, port = 0, lock = lock)
+        port = await server.start()
+        try:
+            async with aiohttp.ClientSession(f'http://127.0.0.1:{port}', auto_decompress = False) as session:
+                return await test(session, toornament.stages[0])
+        finally:
+            await server.stop()
+
+    return asyncio.run(run())
+
+def testAcceptEncodingQualities():
+    assert acceptsGzip('gzip')
+    assert acceptsGzip('br, gzip;q=0.5')
+    assert acceptsGzip('*')
+    assert not acceptsGzip('')
+    assert not acceptsGzip('gzip;q=0')
+    assert not acceptsGzip('gzip;q=0, *')
+    assert not acceptsGzip('*;q=0, identity')
+
+def testRankingIsServedWithETagAndGzip(tmp_path):
+    async def test(session, stage):
+        async with session.get(f'/stages/{stage.alias}/ranking', headers = {'Accept-Encoding': 'gzip'}) as response:
+            assert response.status == 200
+            assert response.headers['Content-Encoding'] == 'gzip'
+            data = json.loads(gzip.decompress(await response.read()))
+            etag = response.headers['ETag']
+
+        async with session.get(f'/stages/{stage.alias}/ranking', headers = {'Accept-Encoding': 'gzip;q=0'}) as response:
+            assert not 'Content-Encoding' in response.headers
+            assert json.loads(await response.read()) == data
+
+        for ifNoneMatch in [etag, '*', f'"other", {etag}']:
+            async with session.get(f'/stages/{stage.alias}/ranking', headers = {'If-None-Match': ifNoneMatch}) as response:
+                assert response.status == 304
+
+        async with session.head(f'/stages/{stage.alias}/ranking', headers = {'Accept-Encoding': 'identity'}) as response:
+            assert response.status == 200
+            assert int(response.headers['Content-Length']) == len(json.dumps(data, separators = (',', ':')))
+
+        return data
+
+    data = runWithServer(tmp_path, test)
+    assert len(data['teams']) == 4 and not data['stale']
+
+def testUnknownPathsAndMethods(tmp_path):
+    async def test(session, stage):
+        async with session.get('/stages/unknown/ranking') as response:
+            assert response.status == 404
+        async with session.post('/stages') as response:
+            assert response.status == 405
+
+    runWithServer(tmp_path, test)
+
+def testBusyDataIsNotWaitedFor(tmp_path):
+    lock = threading.Lock()
+
+    async def test(session, stage):
+        lock.acquire()
+        try:
+            async with session.get('/stages') as response:
+                assert response.status == 503
+                assert response.headers['Retry-After'] == '1'
+        finally:
+            lock.release()
+
+        async with session.get('/stages') as response:
+            assert response.status == 200
+
+    runWithServer(tmp_path, test, lock)
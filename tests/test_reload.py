@@ -0,0 +1,57 @@
+import io
+import os
+from watcher import FileWatcher
+from fakeapi import FakeSeason, createToornament
+
+
+# Writes a file and gives it a new modification time, so the change is noticed even on file systems with coarse timestamps
+def writeFile(path, text, mtime):
+    with io.open(path, 'w', encoding = 'utf-8') as openFile:
+        openFile.write(text)
+    os.utime(path, ns = (mtime, mtime))
+
+def testChangeIsReportedOnceFileIsStable(tmp_path):
+    path = str(tmp_path / 'Teams.csv')
+    writeFile(path, 'Team A;<:a:1>;\n', 1_000_000_000)
+    watcher = FileWatcher([path])
+
+    # First poll after the change, the file might still be written
+    writeFile(path, 'Team A;<:a:1>;\nTeam B;', 2_000_000_000)
+    assert watcher.getChangedFiles() == []
+
+    # Changed again between polls, waits for the next one
+    writeFile(path, 'Team A;<:a:1>;\nTeam B;<:b:2>;\n', 3_000_000_000)
+    assert watcher.getChangedFiles() == []
+
+    assert watcher.getChangedFiles() == [path]
+    assert watcher.getChangedFiles() == []
+
+def testTruncatedTeamsFileIsRefused(tmp_path):
+    toornament = createToornament(FakeSeason(teamsPerGroup = 8, playedRounds = 2), folder = str(tmp_path))
+    stage = toornament.stages[0]
+    teamCount = len(toornament.teamInfos)
+
+    # A save of the editor that only got to the first rows
+    writeFile(str(tmp_path / 'Teams.csv'), 'Team 0-0-0;<:emote:1>;\n', 5_000_000_000)
+    assert toornament.reloadChangedFiles() == []
+    messages = toornament.reloadChangedFiles()
+
+    assert len(messages) == 1 and 'not reloaded' in messages[0]
+    assert len(toornament.teamInfos) == teamCount
+    assert toornament.getWeekInfo(stage).standings.teams[0].emote == '<:emote:1>'
+
+    # An admin confirms that the teams were removed on purpose
+    assert toornament.confirmReloads() == (['Teams.csv'], [])
+    assert [teamInfo.name for teamInfo in toornament.teamInfos] == ['Team 0-0-0']
+    assert toornament.confirmReloads() == ([], [])
+
+def testUnknownTeamsAreShownWithRawName(tmp_path):
+    toornament = createToornament(FakeSeason(teamsPerGroup = 4, playedRounds = 2), folder = str(tmp_path))
+    stage = toornament.stages[0]
+    toornament.teamInfos = toornament.teamInfos[1:]
+
+    week = toornament.getWeekInfo(stage)
+    teams = {team.name: team for team in week.standings.teams}
+    assert teams['Team 0-0-0'].emote == ''
+    assert teams['Team 0-0-1'].emote == '<:emote:1>'
+    assert any(match.homeTeamName == 'Team 0-0-0' and match.homeTeamEmote == '' or match.awayTeamName == 'Team 0-0-0' and match.awayTeamEmote == '' for match in week.matches)